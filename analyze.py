@@ -0,0 +1,107 @@
+# external imports
+import argparse
+import chess
+import json
+import math
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+# local imports
+from bot import ChessBot
+
+# one bot per process, its transposition table is kept between positions
+worker_bot = None
+
+def init_worker(hash_size_mb: float) -> None:
+    global worker_bot
+    worker_bot = ChessBot(chess.BLACK, hash_size_mb=hash_size_mb)
+
+def parse_position(line: str) -> tuple:
+    # full fens are tried first, anything else is read as an epd record with operations
+    try:
+        return chess.Board(line), {}
+    except ValueError:
+        return chess.Board.from_epd(line)
+
+def analyze_position(index: int, line: str, depth: int, movetime: float, max_nodes: int) -> dict:
+    result = {"index": index, "input": line}
+
+    try:
+        board, operations = parse_position(line)
+    except ValueError as error:
+        result["error"] = str(error)
+        return result
+
+    if "id" in operations:
+        result["id"] = operations["id"]
+
+    start_time = time.perf_counter()
+    move = worker_bot.get_best_move(board, depth=depth, time_limit=movetime, max_nodes=max_nodes)
+    elapsed = time.perf_counter() - start_time
+    nodes = worker_bot.nodes + worker_bot.quiescence_nodes
+    score = worker_bot.best_evaluation
+
+    # json has no infinity, mates are reported with the winning side instead of a score
+    result.update({
+        "fen": board.fen(),
+        "bestmove": move.uci() if move else None,
+        "score": score if math.isfinite(score) else None,
+        "mate": None if math.isfinite(score) else ("white" if score > 0 else "black"),
+        "depth": worker_bot.completed_depth,
+        "pv": [pv_move.uci() for pv_move in worker_bot.pv_moves],
+        "nodes": nodes,
+        "nps": round(nodes / elapsed) if elapsed > 0 else None,
+        "time": round(elapsed, 4),
+    })
+    return result
+
+def read_positions(stream):
+    # positions are read lazily so the input is never held in memory as a whole
+    for index, line in enumerate(stream):
+        line = line.strip()
+        if line and not line.startswith("#"):
+            yield index, line
+
+def write_result(output, result: dict) -> None:
+    output.write(json.dumps(result) + "\n")
+    output.flush()
+
+def analyze(stream, output, depth: int = None, movetime: float = None, max_nodes: int = None, workers: int = 1, hash_size_mb: float = 16) -> None:
+    limits = (depth, movetime, max_nodes)
+
+    if workers == 1:
+        init_worker(hash_size_mb)
+        for index, line in read_positions(stream):
+            write_result(output, analyze_position(index, line, *limits))
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(hash_size_mb / workers,)) as executor:
+        # only a couple of positions per worker are in flight, results are written as soon as they complete
+        pending = set()
+        for index, line in read_positions(stream):
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    write_result(output, future.result())
+            pending.add(executor.submit(analyze_position, index, line, *limits))
+
+        for future in wait(pending).done:
+            write_result(output, future.result())
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog='analyze', description="Analyze fen/epd positions and write the results as json lines")
+    parser.add_argument('input', nargs='?', help="File with one fen or epd position per line, reads stdin when omitted")
+    parser.add_argument('--depth', type=int, help="Search depth per position, defaults to the bot's search depth")
+    parser.add_argument('--movetime', type=float, help="Search time per position in seconds")
+    parser.add_argument('--nodes', type=int, help="Node budget per position")
+    parser.add_argument('--workers', type=int, default=1, help="Number of worker processes")
+    parser.add_argument('--hash', type=float, default=16, help="Total transposition table size in MB")
+    args = parser.parse_args()
+
+    stream = open(args.input) if args.input else sys.stdin
+    try:
+        analyze(stream, sys.stdout, args.depth, args.movetime, args.nodes, args.workers, args.hash)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
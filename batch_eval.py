@@ -0,0 +1,53 @@
+# external imports
+import chess
+import numpy as np
+
+# local imports
+from eval_config import piece_planes, stacked_tables, build_piece_square_tables, stack_piece_square_tables
+
+def bitboards(board: chess.Board) -> list:
+    # the twelve piece bitboards in the order of the piece planes
+    return [board.pieces_mask(piece_type, color) for color, piece_type in piece_planes]
+
+def encode(boards: list) -> np.ndarray:
+    # (N, 12) bitboards unpacked into an (N, 12, 64) occupancy tensor where bit i is square i
+    masks = np.array([bitboards(board) for board in boards], dtype="<u8").reshape(len(boards), 12)
+    return np.unpackbits(masks.view(np.uint8), bitorder="little").reshape(len(boards), 12, 64)
+
+def evaluate_occupancy(occupancy: np.ndarray, tables: np.ndarray = stacked_tables) -> np.ndarray:
+    # material and positional score of every position in a single contraction over planes and squares
+    return np.round(np.tensordot(occupancy, tables, axes=([1, 2], [0, 1])), 2)
+
+def evaluate_batch(boards: list, tables: np.ndarray = stacked_tables, checkmates: bool = False) -> np.ndarray:
+    if not boards:
+        return np.zeros(0)
+
+    scores = evaluate_occupancy(encode(boards), tables)
+
+    # checkmate detection needs move generation, so it is only done on request
+    if checkmates:
+        for index, board in enumerate(boards):
+            if board.is_checkmate():
+                scores[index] = float("-inf") if board.turn == chess.WHITE else float("inf")
+
+    return scores
+
+def evaluate_children(board: chess.Board, tables: np.ndarray = stacked_tables) -> list:
+    # score every legal move of a position at once, only the bitboards of each child are collected
+    moves = list(board.legal_moves)
+    masks = []
+    for move in moves:
+        board.push(move)
+        masks.append(bitboards(board))
+        board.pop()
+
+    if not moves:
+        return []
+
+    masks = np.array(masks, dtype="<u8")
+    occupancy = np.unpackbits(masks.view(np.uint8), bitorder="little").reshape(len(moves), 12, 64)
+    return list(zip(moves, evaluate_occupancy(occupancy, tables)))
+
+def tables_for(piece_values: dict, square_table: dict) -> np.ndarray:
+    # stacked tables of a different eval config, for rescoring positions without touching eval_config
+    return stack_piece_square_tables(build_piece_square_tables(piece_values, square_table))
@@ -0,0 +1,159 @@
+# external imports
+import argparse
+import chess
+import json
+import time
+import timeit
+
+# local imports
+from bot import ChessBot
+
+# fixed benchmark positions, tactical positions are epd records with their best move
+positions = {
+    "opening": [
+        "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+        "r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3",
+        "rnbqkb1r/pp2pppp/3p1n2/8/3NP3/8/PPP2PPP/RNBQKB1R w KQkq - 1 5",
+    ],
+    "middlegame": [
+        "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+        "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+        "r1bq1rk1/pp2bppp/2n1pn2/3p4/2PP4/2N1PN2/PP3PPP/R2QKB1R w KQ - 0 8",
+    ],
+    "endgame": [
+        "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+        "8/8/4k3/3p4/3P4/4K3/8/8 w - - 0 1",
+        "6k1/5pp1/7p/8/8/7P/5PP1/3R2K1 w - - 0 1",
+    ],
+    "tactical": [
+        "6k1/5ppp/8/8/8/8/5PPP/3R2K1 w - - bm Rd8#; id \"back rank mate\";",
+        "r1bqkb1r/pppp1ppp/2n2n2/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR w KQkq - bm Qxf7#; id \"scholar's mate\";",
+        "4k3/8/8/8/8/8/4q3/R3K3 w Q - bm Kxe2; id \"free queen\";",
+    ],
+}
+
+# relative slowdown in nodes per second that counts as a regression
+NPS_TOLERANCE = 0.1
+
+# ChessBot options of the selective search that can be switched off from the command line
+SELECTIVE_OPTIONS = ("pvs", "null_move", "late_move_reductions", "futility", "aspiration")
+
+def load_position(record: str) -> tuple:
+    try:
+        return chess.Board(record), {}
+    except ValueError:
+        return chess.Board.from_epd(record)
+
+def run_bench(depth: int, **options) -> dict:
+    results = []
+
+    for category, records in positions.items():
+        for record in records:
+            board, operations = load_position(record)
+
+            # a fresh bot per position keeps the node counts independent of the order of the positions
+            bot = ChessBot(chess.BLACK, **options)
+            start_time = time.perf_counter()
+            move = bot.get_best_move(board, depth=depth)
+            elapsed = time.perf_counter() - start_time
+
+            result = {
+                "category": category,
+                "fen": board.fen(),
+                "move": move.uci() if move else None,
+                "nodes": bot.nodes,
+                "leaf_nodes": bot.leaf_nodes,
+                "quiescence_nodes": bot.quiescence_nodes,
+                "time": elapsed,
+            }
+            if "bm" in operations:
+                result["solved"] = move in operations["bm"]
+
+            results.append(result)
+
+    total_nodes = sum(result["nodes"] + result["quiescence_nodes"] for result in results)
+    total_time = sum(result["time"] for result in results)
+
+    return {
+        "depth": depth,
+        "positions": results,
+        "nodes": total_nodes,
+        "leaf_nodes": sum(result["leaf_nodes"] for result in results),
+        "time": total_time,
+        "nps": total_nodes / total_time if total_time > 0 else 0,
+        # the node count only changes when the shape of the search changes, not its speed
+        "signature": total_nodes,
+    }
+
+def run_micro(number: int = 10000) -> dict:
+    # without the evaluation cache every call evaluates the board instead of returning the cached score
+    bot = ChessBot(chess.BLACK, eval_cache=False)
+    board, _ = load_position(positions["middlegame"][0])
+    bot.material_stack = [bot.material(board)]
+    move = chess.Move.from_uci("e5f7")
+
+    # seconds per call
+    return {
+        "evaluate": timeit.timeit(lambda: bot.evaluate(board), number=number) / number,
+        "material": timeit.timeit(lambda: bot.material(board), number=number) / number,
+        "material_delta": timeit.timeit(lambda: bot.material_delta(board, move), number=number) / number,
+        "legal_moves": timeit.timeit(lambda: list(board.legal_moves), number=number) / number,
+        "push_pop": timeit.timeit(lambda: (bot.push(board, move), bot.pop(board)), number=number) / number,
+    }
+
+def compare(result: dict, baseline: dict) -> list:
+    regressions = []
+
+    if result["depth"] != baseline["depth"]:
+        return [f"baseline was recorded at depth {baseline['depth']}, not {result['depth']}"]
+
+    if result["signature"] != baseline["signature"]:
+        regressions.append(f"search shape changed: signature {baseline['signature']} -> {result['signature']}")
+        for position, base_position in zip(result["positions"], baseline["positions"]):
+            if (position["nodes"], position["move"]) != (base_position["nodes"], base_position["move"]):
+                regressions.append(f"    {position['fen']}: {base_position['move']} {base_position['nodes']} nodes -> {position['move']} {position['nodes']} nodes")
+
+    if result["nps"] < baseline["nps"] * (1 - NPS_TOLERANCE):
+        regressions.append(f"speed dropped: {baseline['nps']:.0f} nps -> {result['nps']:.0f} nps")
+
+    return regressions
+
+def print_result(result: dict) -> None:
+    for position in result["positions"]:
+        solved = "" if "solved" not in position else (" solved" if position["solved"] else " FAILED")
+        print(f"{position['category']:<11} {position['move']:<6} nodes {position['nodes']:>8} leaf {position['leaf_nodes']:>8} qnodes {position['quiescence_nodes']:>8} {position['time']:>7.3f}s{solved}  {position['fen']}")
+
+    print("-"*16)
+    print(f"Depth: {result['depth']}, Nodes: {result['nodes']}, Leaf nodes: {result['leaf_nodes']}, Time: {result['time']:.3f}s, NPS: {result['nps']:.0f}")
+    print(f"Signature: {result['signature']}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog='bench', description="Search benchmark over a fixed set of positions")
+    parser.add_argument('--depth', type=int, default=4, help="Fixed search depth")
+    parser.add_argument('--save', help="Save the results as a json baseline")
+    parser.add_argument('--compare', help="Compare the results against a json baseline, exits with 1 on a regression")
+    parser.add_argument('--micro', action='store_true', help="Time evaluation and move generation on their own")
+    parser.add_argument('--disable', nargs='*', default=[], choices=SELECTIVE_OPTIONS, help="Switch off selective search techniques to measure what they gain")
+    parser.add_argument('--backend', default="python-chess", choices=("python-chess", "bitboard"), help="Board representation used by the search")
+    args = parser.parse_args()
+
+    if args.micro:
+        for name, seconds in run_micro().items():
+            print(f"{name:<15} {seconds * 1e6:8.2f} us")
+        exit()
+
+    result = run_bench(args.depth, backend=args.backend, **{option: False for option in args.disable})
+    print_result(result)
+
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump(result, file, indent=2)
+
+    if args.compare:
+        with open(args.compare) as file:
+            regressions = compare(result, json.load(file))
+
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        if regressions:
+            exit(1)
@@ -0,0 +1,735 @@
+# external imports
+import chess
+import chess.polyglot
+from chess import (
+    BB_ALL, BB_SQUARES, BB_RANK_1, BB_RANK_8, BB_RAYS,
+    BB_KNIGHT_ATTACKS, BB_KING_ATTACKS, BB_PAWN_ATTACKS,
+    BB_DIAG_MASKS, BB_DIAG_ATTACKS, BB_FILE_MASKS, BB_FILE_ATTACKS, BB_RANK_MASKS, BB_RANK_ATTACKS,
+    PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, WHITE, BLACK,
+)
+
+# moves are encoded as from | to << 6 | promotion << 12, a null move is 0 like chess.Move.null()
+PROMOTIONS = (QUEEN, ROOK, BISHOP, KNIGHT)
+
+# every possible move object is created once, so generating moves for the search doesn't create any
+MOVE_TABLE = [
+    chess.Move(code & 63, code >> 6 & 63, code >> 12 or None) if code else chess.Move.null()
+    for code in range(7 << 12)
+]
+
+# squares strictly between two squares on a line, empty if they aren't on one
+BB_BETWEEN = [[chess.between(a, b) for b in chess.SQUARES] for a in chess.SQUARES]
+
+# polyglot zobrist keys, so the incremental key of a position equals chess.polyglot.zobrist_hash
+PIECE_KEYS = [
+    [[0] * 64] + [[chess.polyglot.POLYGLOT_RANDOM_ARRAY[64 * ((piece_type - 1) * 2 + color) + square] for square in chess.SQUARES] for piece_type in chess.PIECE_TYPES]
+    for color in chess.COLORS[::-1]
+]
+EP_KEYS = chess.polyglot.POLYGLOT_RANDOM_ARRAY[772:780]
+TURN_KEY = chess.polyglot.POLYGLOT_RANDOM_ARRAY[780]
+CASTLING_KEYS = {}
+for castling_rights in range(16):
+    rook_squares = 0
+    key = 0
+    for index, square in enumerate((chess.H1, chess.A1, chess.H8, chess.A8)):
+        if castling_rights >> index & 1:
+            rook_squares |= BB_SQUARES[square]
+            key ^= chess.polyglot.POLYGLOT_RANDOM_ARRAY[768 + index]
+    CASTLING_KEYS[rook_squares] = key
+
+# deepest line a board can play out, and the most legal moves any position can have
+MAX_PLY = 256
+MAX_MOVES = 256
+
+class BitBoard:
+    # a compact board for the search: piece bitboards, a mailbox, and preallocated undo and move buffers
+    # instead of python-chess's board state objects. it mirrors the parts of chess.Board that the search uses,
+    # so the search runs on either one. standard chess only
+    __slots__ = (
+        "pieces", "occupied_co", "occupied", "mailbox", "turn", "castling_rights", "ep_square", "ep_key",
+        "halfmove_clock", "fullmove_number", "zobrist", "ply", "move_stack", "buffers",
+        "undo_move", "undo_captured", "undo_castling", "undo_ep", "undo_ep_key", "undo_halfmove", "undo_zobrist",
+    )
+
+    def __init__(self, board: chess.Board = None) -> None:
+        self.pieces = [0] * 7
+        self.occupied_co = [0, 0]
+        self.mailbox = [0] * 64
+
+        self.ply = 0
+        self.move_stack = []
+        self.buffers = [[0] * MAX_MOVES for _ in range(MAX_PLY)]
+        self.undo_move = [0] * MAX_PLY
+        self.undo_captured = [0] * MAX_PLY
+        self.undo_castling = [0] * MAX_PLY
+        self.undo_ep = [None] * MAX_PLY
+        self.undo_ep_key = [0] * MAX_PLY
+        self.undo_halfmove = [0] * MAX_PLY
+        self.undo_zobrist = [0] * MAX_PLY
+
+        self.set_board(board if board is not None else chess.Board())
+
+    @classmethod
+    def from_board(cls, board: chess.Board) -> "BitBoard":
+        return cls(board)
+
+    def set_board(self, board: chess.Board) -> None:
+        if board.chess960:
+            raise ValueError("The bitboard backend only supports standard chess")
+
+        for piece_type in chess.PIECE_TYPES:
+            self.pieces[piece_type] = board.pieces_mask(piece_type, WHITE) | board.pieces_mask(piece_type, BLACK)
+        self.occupied_co[WHITE] = board.occupied_co[WHITE]
+        self.occupied_co[BLACK] = board.occupied_co[BLACK]
+        self.occupied = board.occupied
+        for square in chess.SQUARES:
+            self.mailbox[square] = board.piece_type_at(square) or 0
+
+        self.turn = board.turn
+        self.castling_rights = board.clean_castling_rights()
+        self.ep_square = board.ep_square
+        self.halfmove_clock = board.halfmove_clock
+        self.fullmove_number = board.fullmove_number
+        self.zobrist = chess.polyglot.zobrist_hash(board)
+        self.ep_key = chess.polyglot.ZobristHasher(chess.polyglot.POLYGLOT_RANDOM_ARRAY).hash_ep_square(board)
+
+        # the history before the conversion isn't needed by the search
+        self.ply = 0
+        self.move_stack = []
+
+    def to_board(self) -> chess.Board:
+        board = chess.Board.empty()
+        for square in chess.SQUARES:
+            if self.mailbox[square]:
+                board.set_piece_at(square, chess.Piece(self.mailbox[square], bool(self.occupied_co[WHITE] & BB_SQUARES[square])))
+
+        board.turn = self.turn
+        board.castling_rights = self.castling_rights
+        board.ep_square = self.ep_square
+        board.halfmove_clock = self.halfmove_clock
+        board.fullmove_number = self.fullmove_number
+        return board
+
+    def fen(self) -> str:
+        return self.to_board().fen()
+
+    def copy(self) -> "BitBoard":
+        return BitBoard(self.to_board())
+
+    @property
+    def pawns(self) -> int:
+        return self.pieces[PAWN]
+
+    @property
+    def knights(self) -> int:
+        return self.pieces[KNIGHT]
+
+    @property
+    def bishops(self) -> int:
+        return self.pieces[BISHOP]
+
+    @property
+    def rooks(self) -> int:
+        return self.pieces[ROOK]
+
+    @property
+    def queens(self) -> int:
+        return self.pieces[QUEEN]
+
+    @property
+    def kings(self) -> int:
+        return self.pieces[KING]
+
+    def pieces_mask(self, piece_type: chess.PieceType, color: chess.Color) -> int:
+        return self.pieces[piece_type] & self.occupied_co[color]
+
+    def piece_type_at(self, square: chess.Square) -> chess.PieceType:
+        return self.mailbox[square] or None
+
+    def _transposition_key(self) -> int:
+        # mirrors chess.Board so the transposition table keys both backends the same way
+        return self.zobrist
+
+    def attackers_mask(self, color: chess.Color, square: chess.Square, occupied: int = None) -> int:
+        if occupied is None:
+            occupied = self.occupied
+        pieces = self.pieces
+        queens_and_rooks = pieces[QUEEN] | pieces[ROOK]
+        queens_and_bishops = pieces[QUEEN] | pieces[BISHOP]
+
+        attackers = (
+            (BB_KING_ATTACKS[square] & pieces[KING]) |
+            (BB_KNIGHT_ATTACKS[square] & pieces[KNIGHT]) |
+            (BB_RANK_ATTACKS[square][BB_RANK_MASKS[square] & occupied] & queens_and_rooks) |
+            (BB_FILE_ATTACKS[square][BB_FILE_MASKS[square] & occupied] & queens_and_rooks) |
+            (BB_DIAG_ATTACKS[square][BB_DIAG_MASKS[square] & occupied] & queens_and_bishops) |
+            (BB_PAWN_ATTACKS[not color][square] & pieces[PAWN]))
+
+        return attackers & self.occupied_co[color]
+
+    def king_square(self, color: chess.Color) -> chess.Square:
+        return (self.pieces[KING] & self.occupied_co[color]).bit_length() - 1
+
+    def is_check(self) -> bool:
+        return bool(self.attackers_mask(not self.turn, self.king_square(self.turn)))
+
+    def is_checkmate(self) -> bool:
+        return self.is_check() and not self.generate_moves(self.buffers[self.ply])
+
+    def is_capture(self, move: chess.Move) -> bool:
+        return bool(self.occupied_co[not self.turn] & BB_SQUARES[move.to_square]) or self.is_en_passant(move)
+
+    def is_en_passant(self, move: chess.Move) -> bool:
+        return (
+            self.ep_square == move.to_square and self.mailbox[move.from_square] == PAWN
+            and abs(move.to_square - move.from_square) in (7, 9) and not self.mailbox[move.to_square]
+        )
+
+    def is_castling(self, move: chess.Move) -> bool:
+        return self.mailbox[move.from_square] == KING and abs(move.to_square - move.from_square) == 2
+
+    def is_kingside_castling(self, move: chess.Move) -> bool:
+        return self.is_castling(move) and move.to_square > move.from_square
+
+    def is_queenside_castling(self, move: chess.Move) -> bool:
+        return self.is_castling(move) and move.to_square < move.from_square
+
+    def gives_check(self, move: chess.Move) -> bool:
+        self.make(move.from_square | move.to_square << 6 | (move.promotion or 0) << 12)
+        check = self.is_check()
+        self.unmake()
+        return check
+
+    def is_legal(self, move: chess.Move) -> bool:
+        return move in self.legal_moves
+
+    @property
+    def legal_moves(self) -> list:
+        buffer = self.buffers[self.ply]
+        return [MOVE_TABLE[code] for code in buffer[:self.generate_moves(buffer)]]
+
+    def generate_legal_captures(self) -> list:
+        buffer = self.buffers[self.ply]
+        return [MOVE_TABLE[code] for code in buffer[:self.generate_moves(buffer, captures=True)]]
+
+    def push(self, move: chess.Move) -> None:
+        self.make(move.from_square | move.to_square << 6 | (move.promotion or 0) << 12)
+        self.move_stack.append(move)
+
+    def pop(self) -> chess.Move:
+        self.unmake()
+        return self.move_stack.pop()
+
+    def peek(self) -> chess.Move:
+        return self.move_stack[-1]
+
+    def make(self, code: int) -> None:
+        ply = self.ply
+        self.undo_move[ply] = code
+        self.undo_castling[ply] = castling_rights = self.castling_rights
+        self.undo_ep[ply] = ep_square = self.ep_square
+        self.undo_ep_key[ply] = self.ep_key
+        self.undo_halfmove[ply] = self.halfmove_clock
+        self.undo_zobrist[ply] = self.zobrist
+        self.ply = ply + 1
+
+        us = self.turn
+        them = not us
+        key = self.zobrist ^ TURN_KEY ^ self.ep_key
+        self.ep_square = None
+        self.ep_key = 0
+        self.turn = them
+        if not us:
+            self.fullmove_number += 1
+
+        # passing the turn only changes the side to move and clears the en passant square
+        if not code:
+            self.undo_captured[ply] = 0
+            self.halfmove_clock += 1
+            self.zobrist = key
+            return
+
+        from_square = code & 63
+        to_square = code >> 6 & 63
+        promotion = code >> 12
+        from_bb = BB_SQUARES[from_square]
+        to_bb = BB_SQUARES[to_square]
+        pieces = self.pieces
+        occupied_co = self.occupied_co
+        mailbox = self.mailbox
+        us_keys = PIECE_KEYS[us]
+
+        piece_type = mailbox[from_square]
+        captured = mailbox[to_square]
+        self.undo_captured[ply] = captured
+
+        if captured:
+            pieces[captured] ^= to_bb
+            occupied_co[them] ^= to_bb
+            key ^= PIECE_KEYS[them][captured][to_square]
+
+        # move the piece, a promotion swaps the pawn for the promoted piece
+        new_piece_type = promotion or piece_type
+        pieces[piece_type] ^= from_bb
+        pieces[new_piece_type] ^= to_bb
+        occupied_co[us] ^= from_bb | to_bb
+        mailbox[from_square] = 0
+        mailbox[to_square] = new_piece_type
+        key ^= us_keys[piece_type][from_square] ^ us_keys[new_piece_type][to_square]
+
+        if piece_type == PAWN:
+            self.halfmove_clock = 0
+            distance = to_square - from_square
+
+            if distance == 16 or distance == -16:
+                # the en passant square is only part of the key when a pawn could capture on it
+                self.ep_square = ep_square = from_square + (distance >> 1)
+                if BB_PAWN_ATTACKS[us][ep_square] & pieces[PAWN] & occupied_co[them]:
+                    self.ep_key = EP_KEYS[ep_square & 7]
+                    key ^= self.ep_key
+
+            elif to_square == ep_square and not captured:
+                # the captured pawn sits behind the en passant square
+                captured_square = to_square - 8 if us else to_square + 8
+                captured_bb = BB_SQUARES[captured_square]
+                pieces[PAWN] ^= captured_bb
+                occupied_co[them] ^= captured_bb
+                mailbox[captured_square] = 0
+                key ^= PIECE_KEYS[them][PAWN][captured_square]
+
+        else:
+            self.halfmove_clock = 0 if captured else self.halfmove_clock + 1
+
+            if piece_type == KING:
+                castling_rights &= ~BB_RANK_1 if us else ~BB_RANK_8
+
+                # castling moves the rook next to the king
+                if to_square - from_square == 2 or from_square - to_square == 2:
+                    if to_square > from_square:
+                        rook_from, rook_to = from_square + 3, from_square + 1
+                    else:
+                        rook_from, rook_to = from_square - 4, from_square - 1
+                    rook_bb = BB_SQUARES[rook_from] | BB_SQUARES[rook_to]
+                    pieces[ROOK] ^= rook_bb
+                    occupied_co[us] ^= rook_bb
+                    mailbox[rook_from] = 0
+                    mailbox[rook_to] = ROOK
+                    key ^= us_keys[ROOK][rook_from] ^ us_keys[ROOK][rook_to]
+
+        # moving a king or rook or capturing a rook removes castling rights
+        castling_rights &= ~from_bb & ~to_bb
+        if castling_rights != self.castling_rights:
+            key ^= CASTLING_KEYS[self.castling_rights] ^ CASTLING_KEYS[castling_rights]
+            self.castling_rights = castling_rights
+
+        self.occupied = occupied_co[0] | occupied_co[1]
+        self.zobrist = key
+
+    def unmake(self) -> None:
+        self.ply = ply = self.ply - 1
+        code = self.undo_move[ply]
+        self.castling_rights = self.undo_castling[ply]
+        self.ep_square = ep_square = self.undo_ep[ply]
+        self.ep_key = self.undo_ep_key[ply]
+        self.halfmove_clock = self.undo_halfmove[ply]
+        self.zobrist = self.undo_zobrist[ply]
+
+        self.turn = us = not self.turn
+        them = not us
+        if not us:
+            self.fullmove_number -= 1
+
+        if not code:
+            return
+
+        from_square = code & 63
+        to_square = code >> 6 & 63
+        from_bb = BB_SQUARES[from_square]
+        to_bb = BB_SQUARES[to_square]
+        pieces = self.pieces
+        occupied_co = self.occupied_co
+        mailbox = self.mailbox
+
+        new_piece_type = mailbox[to_square]
+        piece_type = PAWN if code >> 12 else new_piece_type
+        captured = self.undo_captured[ply]
+
+        pieces[new_piece_type] ^= to_bb
+        pieces[piece_type] ^= from_bb
+        occupied_co[us] ^= from_bb | to_bb
+        mailbox[from_square] = piece_type
+        mailbox[to_square] = captured
+
+        if captured:
+            pieces[captured] ^= to_bb
+            occupied_co[them] ^= to_bb
+
+        elif piece_type == PAWN and to_square == ep_square:
+            captured_square = to_square - 8 if us else to_square + 8
+            captured_bb = BB_SQUARES[captured_square]
+            pieces[PAWN] ^= captured_bb
+            occupied_co[them] ^= captured_bb
+            mailbox[captured_square] = PAWN
+
+        elif piece_type == KING and (to_square - from_square == 2 or from_square - to_square == 2):
+            if to_square > from_square:
+                rook_from, rook_to = from_square + 3, from_square + 1
+            else:
+                rook_from, rook_to = from_square - 4, from_square - 1
+            rook_bb = BB_SQUARES[rook_from] | BB_SQUARES[rook_to]
+            pieces[ROOK] ^= rook_bb
+            occupied_co[us] ^= rook_bb
+            mailbox[rook_to] = 0
+            mailbox[rook_from] = ROOK
+
+        self.occupied = occupied_co[0] | occupied_co[1]
+
+    def slider_blockers(self, king: chess.Square) -> int:
+        # our pieces that are the only piece between the king and an enemy slider
+        pieces = self.pieces
+        rooks_and_queens = pieces[ROOK] | pieces[QUEEN]
+        bishops_and_queens = pieces[BISHOP] | pieces[QUEEN]
+        snipers = (
+            (BB_RANK_ATTACKS[king][0] & rooks_and_queens) |
+            (BB_FILE_ATTACKS[king][0] & rooks_and_queens) |
+            (BB_DIAG_ATTACKS[king][0] & bishops_and_queens)) & self.occupied_co[not self.turn]
+
+        blockers = 0
+        between = BB_BETWEEN[king]
+        occupied = self.occupied
+        while snipers:
+            sniper = snipers.bit_length() - 1
+            snipers ^= BB_SQUARES[sniper]
+            blocker = between[sniper] & occupied
+            if blocker and not blocker & (blocker - 1):
+                blockers |= blocker
+
+        return blockers & self.occupied_co[self.turn]
+
+    def ep_skewered(self, king: chess.Square, capturer: chess.Square) -> bool:
+        # the king would be in check along the rank once the pawn and its capturer disappear from it
+        last_double = self.ep_square + (-8 if self.turn == WHITE else 8)
+        occupied = self.occupied & ~BB_SQUARES[last_double] & ~BB_SQUARES[capturer] | BB_SQUARES[self.ep_square]
+        pieces = self.pieces
+        them = self.occupied_co[not self.turn]
+
+        if BB_RANK_ATTACKS[king][BB_RANK_MASKS[king] & occupied] & them & (pieces[ROOK] | pieces[QUEEN]):
+            return True
+        return bool(BB_DIAG_ATTACKS[king][BB_DIAG_MASKS[king] & occupied] & them & (pieces[BISHOP] | pieces[QUEEN]))
+
+    def generate_moves(self, buffer: list, captures: bool = False) -> int:
+        # fills the buffer with the codes of the legal moves and returns how many there are. the moves come out in
+        # the same order as python-chess generates them, so both backends search exactly the same tree
+        us = self.turn
+        our_pieces = self.occupied_co[us]
+        king = self.king_square(us)
+        blockers = self.slider_blockers(king)
+        checkers = self.attackers_mask(not us, king)
+        to_mask = self.occupied_co[not us] if captures else BB_ALL
+
+        if not checkers:
+            count = self.generate_pseudo_legal(buffer, 0, king, blockers, BB_ALL, to_mask)
+        else:
+            # evasions: king moves off the checking lines first, then captures of a single checker or blocks
+            pieces = self.pieces
+            attacked = 0
+            sliders = checkers & (pieces[BISHOP] | pieces[ROOK] | pieces[QUEEN])
+            while sliders:
+                checker = sliders.bit_length() - 1
+                sliders ^= BB_SQUARES[checker]
+                attacked |= BB_RAYS[king][checker] & ~BB_SQUARES[checker]
+
+            count = 0
+            targets = BB_KING_ATTACKS[king] & ~our_pieces & ~attacked & to_mask
+            while targets:
+                to_square = targets.bit_length() - 1
+                targets ^= BB_SQUARES[to_square]
+                if not self.attackers_mask(not us, to_square):
+                    buffer[count] = king | to_square << 6
+                    count += 1
+
+            checker = checkers.bit_length() - 1
+            if BB_SQUARES[checker] == checkers:
+                target = BB_BETWEEN[king][checker] | checkers
+                count = self.generate_pseudo_legal(buffer, count, king, blockers, ~pieces[KING], target & to_mask)
+
+                # the checking pawn can also be captured en passant
+                if not captures and self.ep_square is not None and not BB_SQUARES[self.ep_square] & target:
+                    if self.ep_square + (-8 if us == WHITE else 8) == checker:
+                        count = self.generate_ep(buffer, count, king, blockers)
+
+        if captures and self.ep_square is not None:
+            count = self.generate_legal_ep(buffer, count, king)
+
+        return count
+
+    def generate_pseudo_legal(self, buffer: list, count: int, king: chess.Square, blockers: int, from_mask: int, to_mask: int) -> int:
+        # pseudo legal moves that are only kept when they don't leave the king in check
+        us = self.turn
+        pieces = self.pieces
+        mailbox = self.mailbox
+        occupied = self.occupied
+        our_pieces = self.occupied_co[us]
+        their_pieces = self.occupied_co[not us]
+        king_bb = BB_SQUARES[king]
+
+        # piece moves
+        non_pawns = our_pieces & ~pieces[PAWN] & from_mask
+        while non_pawns:
+            from_square = non_pawns.bit_length() - 1
+            from_bb = BB_SQUARES[from_square]
+            non_pawns ^= from_bb
+            piece_type = mailbox[from_square]
+
+            if piece_type == KNIGHT:
+                attacks = BB_KNIGHT_ATTACKS[from_square]
+            elif piece_type == KING:
+                attacks = BB_KING_ATTACKS[from_square]
+            else:
+                attacks = 0
+                if piece_type != ROOK:
+                    attacks = BB_DIAG_ATTACKS[from_square][BB_DIAG_MASKS[from_square] & occupied]
+                if piece_type != BISHOP:
+                    attacks |= BB_RANK_ATTACKS[from_square][BB_RANK_MASKS[from_square] & occupied] | BB_FILE_ATTACKS[from_square][BB_FILE_MASKS[from_square] & occupied]
+
+            targets = attacks & ~our_pieces & to_mask
+            if from_square == king:
+                while targets:
+                    to_square = targets.bit_length() - 1
+                    targets ^= BB_SQUARES[to_square]
+                    if not self.attackers_mask(not us, to_square):
+                        buffer[count] = from_square | to_square << 6
+                        count += 1
+            elif blockers & from_bb:
+                # pinned pieces can only move along the line through the king
+                rays = BB_RAYS[from_square]
+                while targets:
+                    to_square = targets.bit_length() - 1
+                    targets ^= BB_SQUARES[to_square]
+                    if rays[to_square] & king_bb:
+                        buffer[count] = from_square | to_square << 6
+                        count += 1
+            else:
+                while targets:
+                    to_square = targets.bit_length() - 1
+                    targets ^= BB_SQUARES[to_square]
+                    buffer[count] = from_square | to_square << 6
+                    count += 1
+
+        # castling
+        if from_mask & pieces[KING]:
+            count = self.generate_castling(buffer, count, king, to_mask)
+
+        pawns = pieces[PAWN] & our_pieces & from_mask
+        if not pawns:
+            return count
+
+        # pawn captures
+        capturers = pawns
+        pawn_attacks = BB_PAWN_ATTACKS[us]
+        while capturers:
+            from_square = capturers.bit_length() - 1
+            from_bb = BB_SQUARES[from_square]
+            capturers ^= from_bb
+            targets = pawn_attacks[from_square] & their_pieces & to_mask
+            pinned = blockers & from_bb
+            while targets:
+                to_square = targets.bit_length() - 1
+                targets ^= BB_SQUARES[to_square]
+                if pinned and not BB_RAYS[from_square][to_square] & king_bb:
+                    continue
+                code = from_square | to_square << 6
+                if to_square < 8 or to_square > 55:
+                    for promotion in PROMOTIONS:
+                        buffer[count] = code | promotion << 12
+                        count += 1
+                else:
+                    buffer[count] = code
+                    count += 1
+
+        # pawn advances
+        if us == WHITE:
+            single_moves = pawns << 8 & ~occupied
+            double_moves = single_moves << 8 & ~occupied & (chess.BB_RANK_3 | chess.BB_RANK_4)
+            step = -8
+        else:
+            single_moves = pawns >> 8 & ~occupied
+            double_moves = single_moves >> 8 & ~occupied & (chess.BB_RANK_6 | chess.BB_RANK_5)
+            step = 8
+        single_moves &= to_mask
+        double_moves &= to_mask
+
+        while single_moves:
+            to_square = single_moves.bit_length() - 1
+            single_moves ^= BB_SQUARES[to_square]
+            from_square = to_square + step
+            if blockers & BB_SQUARES[from_square] and not BB_RAYS[from_square][to_square] & king_bb:
+                continue
+            code = from_square | to_square << 6
+            if to_square < 8 or to_square > 55:
+                for promotion in PROMOTIONS:
+                    buffer[count] = code | promotion << 12
+                    count += 1
+            else:
+                buffer[count] = code
+                count += 1
+
+        while double_moves:
+            to_square = double_moves.bit_length() - 1
+            double_moves ^= BB_SQUARES[to_square]
+            from_square = to_square + step * 2
+            if blockers & BB_SQUARES[from_square] and not BB_RAYS[from_square][to_square] & king_bb:
+                continue
+            buffer[count] = from_square | to_square << 6
+            count += 1
+
+        # en passant
+        if self.ep_square is not None and BB_SQUARES[self.ep_square] & to_mask:
+            count = self.generate_ep(buffer, count, king, blockers, from_mask)
+
+        return count
+
+    def generate_ep(self, buffer: list, count: int, king: chess.Square, blockers: int, from_mask: int = BB_ALL) -> int:
+        ep_square = self.ep_square
+        if BB_SQUARES[ep_square] & self.occupied:
+            return count
+
+        us = self.turn
+        capturers = (
+            self.pieces[PAWN] & self.occupied_co[us] & from_mask &
+            BB_PAWN_ATTACKS[not us][ep_square] & chess.BB_RANKS[4 if us else 3])
+        king_bb = BB_SQUARES[king]
+
+        while capturers:
+            capturer = capturers.bit_length() - 1
+            capturers ^= BB_SQUARES[capturer]
+            if blockers & BB_SQUARES[capturer] and not BB_RAYS[capturer][ep_square] & king_bb:
+                continue
+            if not self.ep_skewered(king, capturer):
+                buffer[count] = capturer | ep_square << 6
+                count += 1
+
+        return count
+
+    def generate_legal_ep(self, buffer: list, count: int, king: chess.Square) -> int:
+        # en passant captures are tried on the board, since they can also be check evasions
+        ep_square = self.ep_square
+        if BB_SQUARES[ep_square] & self.occupied:
+            return count
+
+        us = self.turn
+        capturers = self.pieces[PAWN] & self.occupied_co[us] & BB_PAWN_ATTACKS[not us][ep_square] & chess.BB_RANKS[4 if us else 3]
+
+        while capturers:
+            capturer = capturers.bit_length() - 1
+            capturers ^= BB_SQUARES[capturer]
+            code = capturer | ep_square << 6
+            self.make(code)
+            if not self.attackers_mask(self.turn, king):
+                buffer[count] = code
+                count += 1
+            self.unmake()
+
+        return count
+
+    def generate_castling(self, buffer: list, count: int, king: chess.Square, to_mask: int) -> int:
+        us = self.turn
+        backrank = BB_RANK_1 if us == WHITE else BB_RANK_8
+        king_bb = BB_SQUARES[king]
+        if not king_bb & backrank:
+            return count
+
+        candidates = self.castling_rights & backrank & to_mask
+        occupied = self.occupied
+        while candidates:
+            rook = candidates.bit_length() - 1
+            rook_bb = BB_SQUARES[rook]
+            candidates ^= rook_bb
+
+            a_side = rook < king
+            king_to = king - 2 if a_side else king + 2
+            rook_to = king - 1 if a_side else king + 1
+            king_path = BB_BETWEEN[king][king_to]
+            rook_path = BB_BETWEEN[rook][rook_to]
+
+            if (occupied ^ king_bb ^ rook_bb) & (king_path | rook_path | BB_SQUARES[king_to] | BB_SQUARES[rook_to]):
+                continue
+            if self.attacked_for_king(king_path | king_bb, occupied ^ king_bb):
+                continue
+            if self.attacked_for_king(BB_SQUARES[king_to], occupied ^ king_bb ^ rook_bb ^ BB_SQUARES[rook_to]):
+                continue
+
+            buffer[count] = king | king_to << 6
+            count += 1
+
+        return count
+
+    def attacked_for_king(self, path: int, occupied: int) -> bool:
+        them = not self.turn
+        while path:
+            square = path.bit_length() - 1
+            path ^= BB_SQUARES[square]
+            if self.attackers_mask(them, square, occupied):
+                return True
+        return False
+
+    def perft(self, depth: int) -> int:
+        # leaf nodes are counted in bulk from the number of legal moves at depth 1
+        if depth == 0:
+            return 1
+
+        buffer = self.buffers[self.ply]
+        count = self.generate_moves(buffer)
+        if depth == 1:
+            return count
+
+        nodes = 0
+        for index in range(count):
+            self.make(buffer[index])
+            nodes += self.perft(depth - 1)
+            self.unmake()
+        return nodes
+
+def python_chess_perft(board: chess.Board, depth: int) -> int:
+    if depth == 1:
+        return board.legal_moves.count()
+
+    nodes = 0
+    for move in board.legal_moves:
+        board.push(move)
+        nodes += python_chess_perft(board, depth - 1)
+        board.pop()
+    return nodes
+
+if __name__ == '__main__':
+    import time
+
+    # standard perft positions, every count is checked against python-chess itself
+    positions = [
+        (chess.STARTING_FEN, 4),
+        ("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1", 3),
+        ("8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", 5),
+        ("r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1", 4),
+        ("r2q1rk1/pP1p2pp/Q4n2/bbp1p3/Np6/1B3NBn/pPPP1PPP/R3K2R b KQ - 0 1", 4),
+        ("rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8", 3),
+        ("r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10", 3),
+    ]
+
+    failures = 0
+    for fen, depth in positions:
+        board = chess.Board(fen)
+
+        start_time = time.perf_counter()
+        expected = python_chess_perft(board, depth)
+        python_chess_time = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        nodes = BitBoard(board).perft(depth)
+        bitboard_time = time.perf_counter() - start_time
+
+        failures += nodes != expected
+        status = "ok" if nodes == expected else f"FAILED, expected {expected}"
+        print(f"depth {depth} {nodes:>9} nodes  python-chess {python_chess_time:6.2f}s  bitboard {bitboard_time:6.2f}s  {status}  {fen}")
+
+    if failures:
+        exit(1)
@@ -1,140 +1,900 @@
 # external imports
 import chess
+import cProfile
+import multiprocessing
 import os
+import time
+from functools import partial
 
 # local imports
-from eval_config import piece_values, square_table
+from eval_config import piece_values, piece_square_tables
+from transposition import TranspositionTable, EXACT, LOWERBOUND, UPPERBOUND, score_bound
+from ordering import MoveOrderer, static_exchange
+from parallel import ParallelSearch
+from probe import ProbeLayer
+from bitboard import BitBoard
+from stats import SearchStats, instrument
+from eval_cache import EvalCache
+
+class SearchAborted(Exception):
+    pass
 
 class ChessBot:
-    def __init__(self, color: chess.Color) -> None:
+    def __init__(self, color: chess.Color, hash_size_mb: float = 16, debug_eval: bool = False, move_ordering: bool = True, workers: int = 1, quiescence: bool = True, progress_callback = None, book_path: str = None, tablebase_path: str = None, book_policy: str = "weighted", pvs: bool = True, null_move: bool = True, late_move_reductions: bool = True, futility: bool = True, aspiration: bool = True, backend: str = "python-chess", instrumented: bool = None, stats_path: str = None, profile_path: str = None, eval_cache: bool = True) -> None:
         self.SEARCH_DEPTH = 4
+
+        # time management
+        self.MAX_DEPTH = 64
+        self.MOVES_TO_GO = 30
+        self.CLOCK_MARGIN = 0.05
         self.COLOR = color
 
+        # assert that the incremental evaluation matches a full board scan at every leaf
+        self.debug_eval = debug_eval
+
+        # resolve captures at the leaves, captures that can't raise the score by at least this margin are pruned
+        self.use_quiescence = quiescence
+        self.DELTA_MARGIN = 2
+
+        # selective search, every technique can be switched off on its own to measure what it gains
+        self.use_pvs = pvs
+        self.use_null_move = null_move
+        self.use_lmr = late_move_reductions
+        self.use_futility = futility
+        self.use_aspiration = aspiration
+
+        # scores are rounded to hundredths of a pawn, so a window narrower than that can't hold a score
+        self.NULL_WINDOW = 0.001
+        self.NULL_MOVE_REDUCTION = 2
+        self.NULL_MOVE_MIN_DEPTH = 3
+        self.LMR_MIN_DEPTH = 2
+        self.LMR_MIN_INDEX = 3
+        self.ASPIRATION_WINDOW = 0.5
+
+        # the search runs on python-chess boards or on a converted copy of the position in the compact bitboard backend
+        if backend not in ("python-chess", "bitboard"):
+            raise ValueError("Please select a backend of python-chess or bitboard")
+        self.backend = backend
+        self.bitboard = None
+
+        # the transposition table lives as long as the bot so work is reused from move to move
+        self.tt = TranspositionTable(hash_size_mb)
+
+        # full evaluations are cached by position, the search uses them to skip looking for mate at leaves in check
+        self.EVAL_CACHE_SIZE = 1 << 16
+        self.use_eval_cache = eval_cache
+        self.eval_cache = EvalCache(self.EVAL_CACHE_SIZE) if eval_cache else None
+
+        # killer and history tables for ordering moves at every node
+        self.move_ordering = move_ordering
+        self.orderer = MoveOrderer(self.MAX_DEPTH * 2)
+
+        # called with a dict describing the search progress, nothing is reported by default
+        self.progress_callback = progress_callback
+
+        # search statistics of the last move. timing evaluation, move generation and push/pop, writing the statistics
+        # as json lines and profiling the search are all off unless switched on here or by environment variables
+        self.stats = None
+        self.instrumented = bool(os.environ.get("CHESSBOT_INSTRUMENT")) if instrumented is None else instrumented
+        self.stats_path = os.environ.get("CHESSBOT_STATS") if stats_path is None else stats_path
+        self.profile_path = os.environ.get("CHESSBOT_PROFILE") if profile_path is None else profile_path
+        self.profiler = cProfile.Profile() if self.profile_path else None
+        self.search_times = {"evaluate": 0.0, "movegen": 0.0, "push_pop": 0.0}
+        if self.instrumented:
+            instrument(self)
+
+        # opening book and endgame tablebases are probed before searching, counting where every move came from
+        self.probe_layer = ProbeLayer(book_path, tablebase_path, book_policy) if book_path or tablebase_path else None
+        self.move_sources = {"book": 0, "tablebase": 0, "search": 0}
+        self.move_source = None
+
+        # raised by stop(), it is shared with the worker processes of the parallel search
+        self.stop_flag = multiprocessing.Value("b", 0, lock=False)
+
+        # root moves are spread over a process pool when more than one worker is used
+        self.hash_size_mb = hash_size_mb
+        self.workers = workers
+        self.parallel = None
+
+    def search_options(self) -> dict:
+        # the settings a worker process needs to search exactly like this bot
+        return {
+            "hash_size_mb": self.hash_size_mb,
+            "move_ordering": self.move_ordering,
+            "quiescence": self.use_quiescence,
+            "pvs": self.use_pvs,
+            "null_move": self.use_null_move,
+            "late_move_reductions": self.use_lmr,
+            "futility": self.use_futility,
+            "aspiration": self.use_aspiration,
+            "backend": self.backend,
+            "instrumented": self.instrumented,
+            "eval_cache": self.use_eval_cache,
+        }
+
+    def search_board(self, board: chess.Board):
+        if self.backend == "python-chess":
+            return board
+
+        # the bitboard and its buffers are reused from search to search
+        if self.bitboard is None:
+            self.bitboard = BitBoard(board)
+        else:
+            self.bitboard.set_board(board)
+        return self.bitboard
+
+    def parallel_search(self) -> ParallelSearch:
+        # the pool is started on first use and kept alive so the workers' transposition tables persist
+        if self.parallel is None:
+            self.parallel = ParallelSearch(self.workers, self.search_options(), self.stop_flag)
+        return self.parallel
+
+    def set_workers(self, workers: int) -> None:
+        # the pool is restarted with the new size on the next search
+        if self.parallel is not None:
+            self.parallel.close()
+            self.parallel = None
+        self.workers = workers
+
+    def set_hash_size(self, size_mb: float) -> None:
+        # the workers size their tables when the pool starts, so it is restarted too
+        self.hash_size_mb = size_mb
+        self.tt.resize(size_mb)
+        self.set_workers(self.workers)
+
+    def new_game(self) -> None:
+        # nothing learned in the previous game is kept, the workers' tables are dropped with a restart of the pool
+        self.tt.clear()
+        self.orderer.clear()
+        self.set_workers(self.workers)
+
+    def stop(self) -> None:
+        # can be called from another thread, the search returns the best move of the last completed iteration
+        self.stop_flag.value = 1
+
+    def clear_stop(self) -> None:
+        # callers that stop the search from another thread clear the flag before they start the search thread,
+        # so a stop that arrives before the search gets going isn't lost
+        self.stop_flag.value = 0
+
+    def should_stop(self) -> bool:
+        return self.stop_flag.value or time.perf_counter() >= self.deadline
+
+    def close(self) -> None:
+        if self.parallel is not None:
+            self.parallel.close()
+            self.parallel = None
+        if self.probe_layer is not None:
+            self.probe_layer.close()
+            self.probe_layer = None
+
+    def material(self, board: chess.Board) -> float:
+        white_material = 0
+        black_material = 0
+
+        # sum the combined piece and positional values over every piece bitboard
+        for piece_type in chess.PIECE_TYPES:
+            white_table = piece_square_tables[chess.WHITE][piece_type]
+            black_table = piece_square_tables[chess.BLACK][piece_type]
+
+            for square in chess.scan_forward(board.pieces_mask(piece_type, chess.WHITE)):
+                white_material += white_table[square]
+            for square in chess.scan_forward(board.pieces_mask(piece_type, chess.BLACK)):
+                black_material += black_table[square]
+
+        return white_material - black_material
+
     def evaluate(self, board: chess.Board) -> float:
+        if self.eval_cache is None:
+            return self.evaluate_position(board)
+
+        # cached evaluations are the exact scores of earlier calls, so the result is the same with the cache off
+        key = board._transposition_key()
+        evaluation = self.eval_cache.probe(key)
+        if evaluation is None:
+            evaluation = self.evaluate_position(board)
+            self.eval_cache.store(key, evaluation)
+        return evaluation
+
+    def evaluate_position(self, board: chess.Board) -> float:
         if board.is_checkmate():
             if board.turn == chess.WHITE:
                 return float("-inf")
             if board.turn == chess.BLACK:
                 return float("inf")
-        
-        white_material = 0
-        black_material = 0
 
-        # loop through every square in the board
-        for square in chess.SQUARES:
-            piece = board.piece_at(square)
-            if not piece:
-                continue
-            # get the piece value
-            piece_value = piece_values[piece.piece_type]
-
-            # get the piece positional value
-            row, col = chess.square_rank(square), chess.square_file(square)
-            flipped_square = chess.square(col, 7 - row)
-            lookup_square = square if piece.color == chess.BLACK else flipped_square
-            positional_value = square_table[piece.piece_type][lookup_square]
-
-            # add material to total
-            if piece.color == chess.WHITE:
-                white_material += piece_value + positional_value
+        return round(self.material(board), 2)
+
+    def checkmated(self, board: chess.Board) -> bool:
+        # only positions in check can be mate, and finding out needs the legal evasions, so the answer is looked up
+        # in the evaluation cache. leaves that aren't in check skip the cache since a probe costs more than the test
+        if not board.is_check():
+            return False
+        if self.eval_cache is None:
+            return board.is_checkmate()
+        return abs(self.evaluate(board)) == float("inf")
+
+    def evaluate_incremental(self, board: chess.Board) -> float:
+        if self.checkmated(board):
+            if board.turn == chess.WHITE:
+                return float("-inf")
+            if board.turn == chess.BLACK:
+                return float("inf")
+
+        evaluation = round(self.material_stack[-1], 2)
+
+        # cross-check the incremental score against a full rescan of the board
+        if self.debug_eval:
+            assert evaluation == self.evaluate(board), f"incremental eval {evaluation} != full eval {self.evaluate(board)} for {board.fen()}"
+
+        return evaluation
+
+    def material_delta(self, board: chess.Board, move: chess.Move) -> float:
+        # material change for the side to move, from white's point of view at the end
+        color = board.turn
+        own_tables = piece_square_tables[color]
+        enemy_tables = piece_square_tables[not color]
+        piece_type = board.piece_type_at(move.from_square)
+        to_square = move.to_square
+
+        if board.is_castling(move):
+            # move the rook as well, the king lands on the g or c file
+            rank = chess.square_rank(move.from_square)
+            if board.is_kingside_castling(move):
+                to_square = chess.square(6, rank)
+                rook_from, rook_to = chess.square(7, rank), chess.square(5, rank)
             else:
-                black_material += piece_value + positional_value
+                to_square = chess.square(2, rank)
+                rook_from, rook_to = chess.square(0, rank), chess.square(3, rank)
+            delta = own_tables[chess.ROOK][rook_to] - own_tables[chess.ROOK][rook_from]
+        elif board.is_en_passant(move):
+            # the captured pawn sits behind the destination square
+            captured_square = chess.square(chess.square_file(to_square), chess.square_rank(move.from_square))
+            delta = enemy_tables[chess.PAWN][captured_square]
+        else:
+            captured = board.piece_type_at(to_square)
+            delta = enemy_tables[captured][to_square] if captured else 0
+
+        # promotions replace the pawn with the promoted piece
+        new_piece_type = move.promotion or piece_type
+        delta += own_tables[new_piece_type][to_square] - own_tables[piece_type][move.from_square]
+
+        return delta if color == chess.WHITE else -delta
+
+    def legal_moves(self, board: chess.Board) -> list:
+        return list(board.legal_moves)
+
+    def legal_captures(self, board: chess.Board) -> list:
+        return list(board.generate_legal_captures())
+
+    def push(self, board: chess.Board, move: chess.Move) -> None:
+        # update the material score by the move's delta instead of rescanning the board at the leaves
+        self.material_stack.append(self.material_stack[-1] + self.material_delta(board, move))
+        board.push(move)
+
+    def push_null(self, board: chess.Board) -> None:
+        # passing the turn doesn't change the material
+        self.material_stack.append(self.material_stack[-1])
+        board.push(chess.Move.null())
+
+    def pop(self, board: chess.Board) -> None:
+        self.material_stack.pop()
+        board.pop()
 
-        return round(white_material - black_material, 2)
+    def is_quiet(self, board: chess.Board, move: chess.Move) -> bool:
+        return not board.is_capture(move) and not move.promotion and not board.gives_check(move)
 
-    def minimax(self, board: chess.Board, depth, alpha: float, beta: float) -> float:
-        # check if a leaf node has been reached
-        if depth == 0:
+    def null_move_allowed(self, board: chess.Board, depth: int, in_check: bool) -> bool:
+        # no two null moves in a row, and never with only pawns left where having to move can be a disadvantage
+        return (
+            self.use_null_move and depth >= self.NULL_MOVE_MIN_DEPTH and not in_check and not self.following_pv
+            and board.move_stack and board.move_stack[-1]
+            and board.occupied_co[board.turn] & ~(board.pawns | board.kings)
+        )
+
+    def order_root_moves(self, board: chess.Board, first_move: chess.Move) -> list:
+        # root moves are ordered without killers or history so the order only depends on the position and the
+        # previous iteration's best move, which keeps ties between equally scored root moves deterministic
+        moves = self.legal_moves(board)
+        if self.move_ordering:
+            return self.orderer.order_static(board, moves, first_move)
+
+        if first_move in moves:
+            moves.remove(first_move)
+            moves.insert(0, first_move)
+        return moves
+
+    def order_moves(self, board: chess.Board, moves: list, ply: int, first_move: chess.Move) -> list:
+        # hash move, captures by MVV-LVA, promotions, killers, then quiet moves by history
+        if self.move_ordering:
+            return self.orderer.order(board, moves, ply, first_move)
+
+        # legal move generator order with only the hash move in front
+        if first_move in moves:
+            moves.remove(first_move)
+            moves.insert(0, first_move)
+        return moves
+
+    def record_cutoff(self, board: chess.Board, move: chess.Move, index: int, depth: int, ply: int) -> None:
+        self.cutoffs += 1
+        if index == 0:
+            self.first_move_cutoffs += 1
+
+        # quiet moves that cause cutoffs are remembered as killers and in the history table
+        if self.move_ordering and not board.is_capture(move) and not move.promotion:
+            self.orderer.store_killer(ply, move)
+            self.orderer.update_history(board.turn, move, depth)
+
+    def minimax(self, board: chess.Board, depth, alpha: float, beta: float, ply: int = 1) -> float:
+        # stop the search once the node or time budget runs out, quiescence nodes count against the budget too
+        self.nodes += 1
+        self.ply_nodes[ply] += 1
+        if self.can_abort and (self.nodes + self.quiescence_nodes >= self.max_nodes or (self.nodes & 255 == 0 and self.should_stop())):
+            raise SearchAborted()
+
+        # the principal variation of this node starts out empty
+        self.pv_length[ply] = ply
+
+        # check if a leaf node has been reached, captures are resolved by the quiescence search
+        if depth <= 0:
             self.leaf_nodes += 1
-            return self.evaluate(board)
+            if self.use_quiescence:
+                return self.quiescence(board, alpha, beta)
+            return self.evaluate_incremental(board)
+
+        # probe the transposition table for a stored score and best move
+        key = self.tt.key(board)
+        entry = self.tt.probe(key)
+        hash_move = None
+
+        if entry is not None:
+            _, entry_depth, entry_score, bound, hash_move, _ = entry
+
+            # only reuse scores that were searched at least as deep as this node, in fixed depth searches only scores
+            # of exactly this depth are reused so the result doesn't depend on what earlier searches left in the table
+            if entry_depth == depth or (entry_depth > depth and not self.deterministic):
+                if bound == EXACT:
+                    return entry_score
+                if bound == LOWERBOUND and entry_score >= beta:
+                    return entry_score
+                if bound == UPPERBOUND and entry_score <= alpha:
+                    return entry_score
+
+        in_check = board.is_check()
+        static_evaluation = round(self.material_stack[-1], 2)
+
+        # null move pruning: if passing the turn still fails high on a shallower search, a real move will too
+        if self.null_move_allowed(board, depth, in_check):
+            white = board.turn == chess.WHITE
+            bound = beta if white else alpha
+
+            if abs(bound) != float("inf") and (static_evaluation >= beta if white else static_evaluation <= alpha):
+                self.null_move_tries += 1
+                self.push_null(board)
+                if white:
+                    evaluation = self.minimax(board, depth - 1 - self.NULL_MOVE_REDUCTION, beta - self.NULL_WINDOW, beta, ply + 1)
+                else:
+                    evaluation = self.minimax(board, depth - 1 - self.NULL_MOVE_REDUCTION, alpha, alpha + self.NULL_WINDOW, ply + 1)
+                self.pop(board)
+
+                if evaluation >= beta if white else evaluation <= alpha:
+                    self.null_move_cutoffs += 1
+                    return bound
+
+        # search the hash move first since it is the most likely to cause a cutoff
+        moves = self.legal_moves(board)
+        first_move = hash_move
+
+        # while following the previous iteration's principal variation, its move goes before everything else
+        if self.following_pv:
+            pv_move = self.pv_moves[ply] if ply < len(self.pv_moves) else None
+            if pv_move in moves:
+                first_move = pv_move
+            else:
+                self.following_pv = False
+
+        moves = self.order_moves(board, moves, ply, first_move)
+
+        original_alpha, original_beta = alpha, beta
+        best_move = None
+
+        # quiet moves at frontier nodes are pruned by futility, late quiet moves at deeper nodes are reduced
+        frontier = self.use_futility and depth == 1 and not in_check
+        reducible = self.use_lmr and depth >= self.LMR_MIN_DEPTH and not in_check
 
         # white to play
         if board.turn:
             # initialize search data
             best_evaluation = float("-inf")
 
-            for move in board.legal_moves:
+            for index, move in enumerate(moves):
+                # the opponent can stand pat right after a quiet move at a frontier node, so it can't score better
+                # than the evaluation after the move. moves that can't reach alpha are skipped without searching
+                if frontier and index and self.is_quiet(board, move):
+                    futile_evaluation = round(self.material_stack[-1] + self.material_delta(board, move), 2)
+                    if futile_evaluation <= alpha:
+                        self.futility_prunes += 1
+                        best_evaluation = max(best_evaluation, futile_evaluation)
+                        continue
+
+                reduction = 0
+                if reducible and index >= self.LMR_MIN_INDEX and self.is_quiet(board, move):
+                    reduction = min(1 if index < self.LMR_MIN_INDEX * 2 else 2, depth - 1)
+
                 # search sub tree and return the evaluation
-                board.push(move)
-                evaluation = self.minimax(board, depth - 1, alpha, beta)
-                board.pop()
+                self.push(board, move)
+                evaluation = self.search_child(board, depth - 1, alpha, beta, ply + 1, reduction, index == 0)
+                self.pop(board)
+                self.following_pv = False
 
                 # store the move if it is better than the old best move
-                if evaluation > best_evaluation:
+                if evaluation > best_evaluation or best_move is None:
                     best_evaluation = evaluation
-                    self.best_variation[self.SEARCH_DEPTH - depth] = board.san(move)
-                
+                    best_move = move
+
+                # moves that raise alpha extend the principal variation
+                if evaluation > alpha:
+                    self.update_pv(ply, move)
+
                 # update alpha
                 alpha = max(alpha, evaluation)
 
                 # prune remaining branches
                 if alpha >= beta:
+                    self.record_cutoff(board, move, index, depth, ply)
                     break
 
         else:
             # initialize search data
             best_evaluation = float("inf")
 
-            for move in board.legal_moves:
+            for index, move in enumerate(moves):
+                # the opponent can stand pat right after a quiet move at a frontier node, so it can't score better
+                # than the evaluation after the move. moves that can't reach beta are skipped without searching
+                if frontier and index and self.is_quiet(board, move):
+                    futile_evaluation = round(self.material_stack[-1] + self.material_delta(board, move), 2)
+                    if futile_evaluation >= beta:
+                        self.futility_prunes += 1
+                        best_evaluation = min(best_evaluation, futile_evaluation)
+                        continue
+
+                reduction = 0
+                if reducible and index >= self.LMR_MIN_INDEX and self.is_quiet(board, move):
+                    reduction = min(1 if index < self.LMR_MIN_INDEX * 2 else 2, depth - 1)
+
                 # search sub tree and return the evaluation
-                board.push(move)
-                evaluation = self.minimax(board, depth - 1, alpha, beta)
-                board.pop()
+                self.push(board, move)
+                evaluation = self.search_child(board, depth - 1, alpha, beta, ply + 1, reduction, index == 0)
+                self.pop(board)
+                self.following_pv = False
 
                 # store the move if it is better than the old best move
-                if evaluation < best_evaluation:
+                if evaluation < best_evaluation or best_move is None:
                     best_evaluation = evaluation
-                    self.best_variation[self.SEARCH_DEPTH - depth] = board.san(move)
+                    best_move = move
+
+                # moves that lower beta extend the principal variation
+                if evaluation < beta:
+                    self.update_pv(ply, move)
 
                 # update beta
                 beta = min(beta, evaluation)
 
+                # prune remaining branches
                 if alpha >= beta:
+                    self.record_cutoff(board, move, index, depth, ply)
                     break
 
+        # store the result along with how it relates to the search window
+        if best_evaluation <= original_alpha:
+            bound = UPPERBOUND
+        elif best_evaluation >= original_beta:
+            bound = LOWERBOUND
+        else:
+            bound = EXACT
+        self.tt.store(key, depth, best_evaluation, bound, best_move)
+
         return best_evaluation
 
-    def get_best_move(self, board: chess.Board) -> chess.Move:
-        # initialize search data, assume the bot is playing black
-        self.leaf_nodes = 0
-        self.best_variation = [None] * self.SEARCH_DEPTH
+    def search_child(self, board: chess.Board, depth: int, alpha: float, beta: float, ply: int, reduction: int = 0, full_window: bool = True) -> float:
+        # called with the move already pushed, so the side that played it is the one not to move
+        white = board.turn == chess.BLACK
+        bound = alpha if white else beta
+
+        # principal variation search: after the first move, moves only have to prove that they are better than the
+        # best score so far with a null window around it, and are searched again with the full window if they are
+        if full_window or not self.use_pvs or abs(bound) == float("inf"):
+            scout_alpha, scout_beta = alpha, beta
+        elif white:
+            scout_alpha, scout_beta = alpha, alpha + self.NULL_WINDOW
+        else:
+            scout_alpha, scout_beta = beta - self.NULL_WINDOW, beta
+
+        # late move reductions: late quiet moves are searched shallower first and only at full depth if they improve
+        if reduction:
+            self.lmr_reductions += 1
+            evaluation = self.minimax(board, depth - reduction, scout_alpha, scout_beta, ply)
+            if evaluation <= alpha if white else evaluation >= beta:
+                return evaluation
+            self.lmr_researches += 1
+
+        if (scout_alpha, scout_beta) != (alpha, beta):
+            evaluation = self.minimax(board, depth, scout_alpha, scout_beta, ply)
+            if evaluation <= alpha or evaluation >= beta:
+                return evaluation
+            self.pvs_researches += 1
+
+        return self.minimax(board, depth, alpha, beta, ply)
+
+    def quiescence(self, board: chess.Board, alpha: float, beta: float) -> float:
+        # stop the search once the node or time budget runs out
+        self.quiescence_nodes += 1
+        if self.can_abort and (self.nodes + self.quiescence_nodes >= self.max_nodes or (self.quiescence_nodes & 255 == 0 and self.should_stop())):
+            raise SearchAborted()
+
+        # stand pat: the side to move doesn't have to capture if the position is already good enough
+        stand_pat = self.evaluate_incremental(board)
+        if abs(stand_pat) == float("inf"):
+            return stand_pat
+
+        maximizing = board.turn == chess.WHITE
+        if maximizing:
+            if stand_pat >= beta:
+                return stand_pat
+            alpha = max(alpha, stand_pat)
+        else:
+            if stand_pat <= alpha:
+                return stand_pat
+            beta = min(beta, stand_pat)
+
+        best_evaluation = stand_pat
+
+        for move in self.orderer.order_static(board, self.legal_captures(board)):
+            # delta pruning: skip captures that can't change the score even when the captured piece is won for free.
+            # the skipped capture could still score up to that optimistic bound, so the fail-soft result has to include it
+            victim = chess.PAWN if board.is_en_passant(move) else board.piece_type_at(move.to_square)
+            gain = piece_values[victim] + (piece_values[move.promotion] - piece_values[chess.PAWN] if move.promotion else 0)
+            if maximizing and stand_pat + gain + self.DELTA_MARGIN <= alpha:
+                best_evaluation = max(best_evaluation, round(stand_pat + gain + self.DELTA_MARGIN, 2))
+                continue
+            if not maximizing and stand_pat - gain - self.DELTA_MARGIN >= beta:
+                best_evaluation = min(best_evaluation, round(stand_pat - gain - self.DELTA_MARGIN, 2))
+                continue
+
+            # skip captures that lose material when the exchange is played out
+            if piece_values[board.piece_type_at(move.from_square)] > piece_values[victim] and static_exchange(board, move) < 0:
+                continue
+
+            self.push(board, move)
+            evaluation = self.quiescence(board, alpha, beta)
+            self.pop(board)
+
+            if maximizing:
+                best_evaluation = max(best_evaluation, evaluation)
+                alpha = max(alpha, evaluation)
+            else:
+                best_evaluation = min(best_evaluation, evaluation)
+                beta = min(beta, evaluation)
+
+            # prune remaining captures
+            if alpha >= beta:
+                break
+
+        return best_evaluation
+
+    def search_move(self, board: chess.Board, move: chess.Move, depth: int, alpha: float, beta: float, full_window: bool = True) -> float:
+        # fixed depth searches search every root move from empty tables, so late move reductions see the same move
+        # order and its score doesn't depend on which moves were searched before it, in this process or another one
+        if self.deterministic:
+            self.tt.start_over()
+            self.orderer.clear()
+
+        self.push(board, move)
+        evaluation = self.search_child(board, depth - 1, alpha, beta, 1, full_window=full_window)
+        self.pop(board)
+        return evaluation
+
+    def search_root(self, board: chess.Board, depth: int, moves: list, alpha: float = float("-inf"), beta: float = float("inf")) -> tuple:
+        # the side to move at the root maximizes as white and minimizes as black
+        maximizing = board.turn == chess.WHITE
         best_move = None
-        best_evaluation = float("inf")
-        all_evaluations = []
+        best_evaluation = float("-inf") if maximizing else float("inf")
+        best_variation = []
+        original_alpha, original_beta = alpha, beta
+        self.root_evaluations = []
+        self.ply_nodes[0] += 1
 
-        for iteration, move in enumerate(board.legal_moves):
+        for iteration, move in enumerate(moves):
             # search sub tree and return the evaluation
-            board.push(move)
-            evaluation = self.minimax(board, self.SEARCH_DEPTH - 1, alpha = float("-inf"), beta = float("inf"))
-            board.pop()
+            evaluation = self.search_move(board, move, depth, alpha, beta, iteration == 0)
+            self.following_pv = False
+
+            # moves that fail low only have a bound on their score, which depends on the window they got
+            bound = score_bound(evaluation, alpha, beta)
+            self.root_evaluations.append((move, evaluation, bound))
 
-            # debug
-            all_evaluations.append([board.san(move), evaluation])
-            os.system("clear")
-            print(f"Searched {iteration+1}/{len(list(board.legal_moves))} moves")
+            if self.progress_callback is not None:
+                self.report("root_move", depth=depth, move=move, index=iteration, moves=len(moves), score=evaluation, bound=bound)
 
             # store the move if it is better than the old best move
-            if evaluation < best_evaluation:
+            if best_move is None or (evaluation > best_evaluation if maximizing else evaluation < best_evaluation):
                 best_move = move
                 best_evaluation = evaluation
-                self.best_variation[0] = board.san(move)
-        
-        if best_move == None:
-            return list(board.legal_moves)[0]
 
-        # debug
+                # the variation is read right after the move's search, before later root moves overwrite the tables
+                board.push(move)
+                best_variation = self.principal_variation(board, depth - 1, ply=1)
+                board.pop()
+
+                # later root moves only need to prove they are better than this one. fixed depth searches keep the
+                # window left by the first move for all of them, which the parallel search can give each move too
+                if iteration == 0 or not self.deterministic:
+                    if maximizing:
+                        alpha = max(alpha, evaluation)
+                    else:
+                        beta = min(beta, evaluation)
+
+            # a score outside of an aspiration window ends the iteration early
+            if best_evaluation >= beta if maximizing else best_evaluation <= alpha:
+                break
+
+        self.tt.store(self.tt.key(board), depth, best_evaluation, score_bound(best_evaluation, original_alpha, original_beta), best_move)
+        self.pv_moves = [best_move] + best_variation if best_move is not None else []
+        return best_move, best_evaluation
+
+    def aspiration_search(self, search_root, depth: int, moves: list, previous_evaluation: float) -> tuple:
+        # the root is searched with a narrow window around the previous iteration's score. a score outside of the
+        # window is only a bound, so the iteration is searched again with that side of the window opened up
+        if not self.use_aspiration or self.completed_depth == 0 or abs(previous_evaluation) == float("inf"):
+            return search_root(depth, moves)
+
+        alpha = previous_evaluation - self.ASPIRATION_WINDOW
+        beta = previous_evaluation + self.ASPIRATION_WINDOW
+
+        while True:
+            move, evaluation = search_root(depth, moves, alpha, beta)
+
+            if evaluation <= alpha and alpha != float("-inf"):
+                alpha = float("-inf")
+            elif evaluation >= beta and beta != float("inf"):
+                beta = float("inf")
+            else:
+                return move, evaluation
+
+            self.aspiration_researches += 1
+
+    def update_pv(self, ply: int, move: chess.Move) -> None:
+        # the variation of this node is the move followed by the variation of the child node
+        row = self.pv_table[ply]
+        length = self.pv_length[ply + 1]
+        row[ply] = move
+        row[ply + 1:length] = self.pv_table[ply + 1][ply + 1:length]
+        self.pv_length[ply] = length
+
+    def principal_variation(self, board: chess.Board, depth: int, ply: int = 0) -> list:
+        # moves collected in the triangular pv table, without the moves leading to this ply
+        variation = self.pv_table[ply][ply:self.pv_length[ply]]
+
+        # the variation stops early at transposition table cutoffs, so it is continued with the stored hash moves
+        for move in variation:
+            board.push(move)
+        while len(variation) < depth:
+            entry = self.tt.probe(self.tt.key(board))
+            if entry is None or entry[4] is None or not board.is_legal(entry[4]):
+                break
+            variation.append(entry[4])
+            board.push(entry[4])
+
+        for _ in variation:
+            board.pop()
+        return variation
+
+    def variation_san(self, board: chess.Board, variation: list) -> list:
+        # standard algebraic notation is only generated once the search is over
+        san = []
+        for move in variation:
+            san.append(board.san(move))
+            board.push(move)
+        for _ in variation:
+            board.pop()
+        return san
+
+    def report(self, report_type: str, **info) -> None:
+        self.progress_callback(dict(info, type=report_type))
+
+    def allocate_time(self, time_limit: float, clock: float, increment: float) -> float:
+        budget = float("inf")
+        if time_limit is not None:
+            budget = time_limit
+
+        # spend a slice of the remaining clock plus most of the increment, keeping a safety margin
+        if clock is not None:
+            budget = min(budget, clock / self.MOVES_TO_GO + increment * 0.8, max(clock - self.CLOCK_MARGIN, 0.01))
+
+        return budget
+
+    def start_search(self, board: chess.Board, budget: float = float("inf"), max_nodes: int = None, deterministic: bool = True) -> None:
+        # initialize search data
+        self.start_time = time.perf_counter()
+        self.deadline = self.start_time + budget
+        self.max_nodes = max_nodes or float("inf")
+        self.deterministic = deterministic
+        self.can_abort = False
+        self.nodes = 0
+        self.leaf_nodes = 0
+        self.quiescence_nodes = 0
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.null_move_tries = 0
+        self.null_move_cutoffs = 0
+        self.lmr_reductions = 0
+        self.lmr_researches = 0
+        self.pvs_researches = 0
+        self.futility_prunes = 0
+        self.aspiration_researches = 0
+        self.ply_nodes = [0] * (self.MAX_DEPTH + 2)
+        self.iteration_nodes = []
+        self.search_times = dict.fromkeys(self.search_times, 0.0)
+        self.orderer.new_search()
+        self.tt.new_search()
+        self.tt.reset_stats()
+        if self.eval_cache is not None:
+            self.eval_cache.reset_stats()
+        self.material_stack = [self.material(board)]
+        self.pv_moves = []
+        self.following_pv = False
+        self.pv_table = [[None] * (self.MAX_DEPTH + 2) for _ in range(self.MAX_DEPTH + 2)]
+        self.pv_length = [0] * (self.MAX_DEPTH + 2)
+        self.root_evaluations = []
+        self.completed_depth = 0
+
+    def finish_probe(self, board: chess.Board, move: chess.Move, source: str, score: float) -> chess.Move:
+        self.move_sources[source] += 1
+        self.move_source = source
+        self.best_evaluation = self.evaluate(board) if score is None else score
+        self.pv_moves = [move]
+        self.best_variation = self.variation_san(board, self.pv_moves)
+        return move
+
+    def get_best_move(self, board: chess.Board, depth: int = None, time_limit: float = None, clock: float = None, increment: float = 0, max_nodes: int = None, clear_stop: bool = True) -> chess.Move:
+        if clear_stop:
+            self.clear_stop()
+
+        # the profiler only runs during the search, its statistics add up over all the moves the bot has played
+        if self.profiler is not None:
+            self.profiler.enable()
+        try:
+            best_move = self.find_best_move(board, depth, time_limit, clock, increment, max_nodes)
+        finally:
+            if self.profiler is not None:
+                self.profiler.disable()
+                self.profiler.dump_stats(self.profile_path)
+
+        self.stats = SearchStats(self, board, best_move, time.perf_counter() - self.start_time)
+        if self.stats_path:
+            self.stats.write(self.stats_path)
+
+        if self.progress_callback is not None:
+            self.report("done", board=board, depth=self.completed_depth, move=best_move, score=self.best_evaluation, pv=self.pv_moves, nodes=self.nodes, time=self.stats.time, source=self.move_source, bot=self, stats=self.stats)
+
+        return best_move
+
+    def find_best_move(self, board: chess.Board, depth: int = None, time_limit: float = None, clock: float = None, increment: float = 0, max_nodes: int = None) -> chess.Move:
+        # without a time or node budget the search runs to a fixed depth
+        timed = time_limit is not None or clock is not None or max_nodes is not None
+        max_depth = depth or (self.MAX_DEPTH if timed else self.SEARCH_DEPTH)
+
+        self.start_search(board, self.allocate_time(time_limit, clock, increment), max_nodes, deterministic=not timed)
+
+        # known positions are answered by the opening book or the tablebases without searching
+        if self.probe_layer is not None:
+            result = self.probe_layer.probe(board)
+            if result is not None:
+                return self.finish_probe(board, *result)
+
+        self.move_sources["search"] += 1
+        self.move_source = "search"
+        search_board = self.search_board(board)
+        root_stack_size = len(search_board.move_stack)
+        moves = list(board.legal_moves)
+        best_move = moves[0] if moves else None
+        best_evaluation = self.evaluate(board)
+        root_evaluations = []
+        variation = []
+
+        for iteration_depth in range(1, max_depth + 1):
+            # search the previous iteration's best move first
+            moves = self.order_root_moves(search_board, self.pv_moves[0] if self.pv_moves else None)
+            self.following_pv = bool(self.pv_moves)
+
+            # the parallel search is given the position itself, the serial search the board it searches on
+            if self.workers > 1:
+                search_root = partial(self.parallel_search().search_root, self, board)
+            else:
+                search_root = partial(self.search_root, search_board)
+
+            try:
+                move, evaluation = self.aspiration_search(search_root, iteration_depth, moves, best_evaluation)
+            except SearchAborted:
+                # unwind the moves of the unfinished iteration and keep the last completed result
+                while len(search_board.move_stack) > root_stack_size:
+                    search_board.pop()
+                self.material_stack = self.material_stack[:1]
+                break
+
+            best_move, best_evaluation, root_evaluations, variation = move, evaluation, self.root_evaluations, self.pv_moves
+            self.completed_depth = iteration_depth
+            self.iteration_nodes.append(self.nodes)
+
+            if self.progress_callback is not None:
+                self.report("iteration", board=board, depth=iteration_depth, move=best_move, score=best_evaluation, pv=self.pv_moves, nodes=self.nodes, time=time.perf_counter() - self.start_time)
+
+            # depth 1 always completes so there is a move to fall back on
+            self.can_abort = True
+
+            # stop early once a forced mate is found or the next iteration is unlikely to finish in time
+            if abs(best_evaluation) == float("inf"):
+                break
+            if time.perf_counter() - self.start_time > (self.deadline - self.start_time) / 2:
+                break
+            if self.nodes + self.quiescence_nodes >= self.max_nodes:
+                break
+
+        self.best_evaluation = best_evaluation
+        self.root_evaluations = root_evaluations
+        # an unfinished iteration can leave the variation of an aspiration search that failed behind
+        self.pv_moves = variation
+        self.best_variation = self.variation_san(board, self.pv_moves)
+        return best_move
+
+def print_progress(info: dict) -> None:
+    # console report of the search for interactive use
+    if info["type"] == "iteration":
+        print(f"Depth {info['depth']}: {info['score']} {info['board'].variation_san(info['pv'])}")
+
+    elif info["type"] == "done":
+        bot, board = info["bot"], info["board"]
+
         print("-"*16)
-        print(f"Best evaluation: {best_evaluation}, Leaf nodes: {self.leaf_nodes}")
-        
+        if info["source"] != "search":
+            print(f"{info['source'].capitalize()} move: {bot.best_variation[0]}, Evaluation: {bot.best_evaluation}")
+            print(f"Move sources: {bot.move_sources}")
+            return
+
+        print(f"Depth: {bot.completed_depth}, Best evaluation: {bot.best_evaluation}, Nodes: {bot.nodes}, Leaf nodes: {bot.leaf_nodes}, Quiescence nodes: {bot.quiescence_nodes}")
+        print(f"Cutoffs: {bot.cutoffs}, first move cutoffs: {bot.first_move_cutoffs / max(bot.cutoffs, 1):.1%}")
+        print(f"Null move cutoffs: {bot.null_move_cutoffs}/{bot.null_move_tries}, LMR re-searches: {bot.lmr_researches}/{bot.lmr_reductions}, PVS re-searches: {bot.pvs_researches}, futility prunes: {bot.futility_prunes}, aspiration re-searches: {bot.aspiration_researches}")
+        print(f"TT hits: {bot.tt.hits}, misses: {bot.tt.misses}, collisions: {bot.tt.collisions}, full: {bot.tt.hashfull()}/1000")
+        if bot.eval_cache is not None:
+            print(f"Eval cache hit rate: {bot.eval_cache.hit_rate():.1%}, evictions: {bot.eval_cache.evictions}")
+
+        stats = info["stats"]
+        branching = f"{stats.effective_branching_factor:.2f}" if stats.effective_branching_factor is not None else "-"
+        print(f"NPS: {stats.nps:.0f}, effective branching factor: {branching}, nodes per ply: {stats.ply_nodes}")
+        if stats.times is not None:
+            print(f"Time: {stats.time:.3f}s, " + ", ".join(f"{category}: {seconds / max(stats.time, 1e-9):.1%}" for category, seconds in stats.times.items()))
+
+        # root moves that failed low are shown as the bound they were proven to be worse than
         print("Depth 0 evaluations: ", end="")
-        for move, evaluation in all_evaluations:
-            print(f"{move}: {evaluation}, ", end="")
+        for move, evaluation, bound in bot.root_evaluations:
+            prefix = {EXACT: "", UPPERBOUND: "<=", LOWERBOUND: ">="}[bound]
+            print(f"{board.san(move)}: {prefix}{evaluation}, ", end="")
         print()
 
         print("Best variation: ", end="")
-        for move in self.best_variation:
+        for move in bot.best_variation:
             print(move, end=", ")
         print()
 
-        return best_move
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='bot')
+    parser.add_argument('--uci', action='store_true', help="Run the bot as a uci engine on stdin and stdout")
+    args = parser.parse_args()
 
+    if args.uci:
+        from uci import UciEngine
+        UciEngine().run()
+    else:
+        parser.print_help()
@@ -0,0 +1,38 @@
+# external imports
+from collections import OrderedDict
+
+class EvalCache:
+    def __init__(self, size: int) -> None:
+        # holds at most size entries, the least recently used entry is evicted first
+        self.size = size
+        self.clear()
+
+    def clear(self) -> None:
+        self.entries = OrderedDict()
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def probe(self, key):
+        # the entry is taken out and put back so it moves to the most recently used end
+        value = self.entries.pop(key, None)
+        if value is None:
+            self.misses += 1
+            return None
+
+        self.entries[key] = value
+        self.hits += 1
+        return value
+
+    def store(self, key, value) -> None:
+        self.entries[key] = value
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def hit_rate(self) -> float:
+        probes = self.hits + self.misses
+        return self.hits / probes if probes else 0
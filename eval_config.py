@@ -1,5 +1,7 @@
-from chess import PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING
+from chess import PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, WHITE, BLACK, PIECE_TYPES, SQUARES, square_mirror
 from numpy import array
+from math import isfinite
+from numbers import Real
 
 piece_values = {
     PAWN: 1,
@@ -76,4 +78,41 @@ square_table = {
          0.2, -0.5,  0.0, -1.0, -1.0,  0.0, -0.5,  0.2,
          1.0,  0.8, -1.0, -0.1, -0.2, -1.0,  0.8,  1.0,
     ])
-}
\ No newline at end of file
+}
+
+def build_piece_square_tables(piece_values: dict, square_table: dict) -> tuple:
+    # combine the piece value and positional value of every (color, piece type, square) into flat tuples,
+    # indexed as piece_square_tables[color][piece_type][square]. tuples are used over numpy arrays since
+    # scalar lookups into a tuple are roughly 3x faster than indexing a numpy array with a python int
+    tables = ([None] * 7, [None] * 7)
+
+    for piece_type in PIECE_TYPES:
+        if piece_type not in piece_values or piece_type not in square_table:
+            raise ValueError(f"Missing piece value or square table for piece type {piece_type}")
+        if len(square_table[piece_type]) != 64:
+            raise ValueError(f"Square table for piece type {piece_type} has {len(square_table[piece_type])} entries instead of 64")
+
+        # a nan, an infinity or a non-number in a table would silently break every evaluation
+        for value in (piece_values[piece_type], *square_table[piece_type]):
+            if isinstance(value, bool) or not isinstance(value, Real) or not isfinite(value):
+                raise ValueError(f"Piece value or square table for piece type {piece_type} has an invalid entry {value!r}")
+
+        # the tables are written from white's point of view with a8 first, which is black's orientation of the squares
+        tables[BLACK][piece_type] = tuple(float(piece_values[piece_type] + square_table[piece_type][square]) for square in SQUARES)
+        tables[WHITE][piece_type] = tuple(float(piece_values[piece_type] + square_table[piece_type][square_mirror(square)]) for square in SQUARES)
+
+    return tuple(tuple(table) for table in tables)
+
+piece_square_tables = build_piece_square_tables(piece_values, square_table)
+
+# order of the twelve piece planes used by the batch evaluator
+piece_planes = [(color, piece_type) for color in (WHITE, BLACK) for piece_type in PIECE_TYPES]
+
+def stack_piece_square_tables(piece_square_tables: tuple):
+    # one row per piece plane, black rows are negated so a dot product gives white's advantage
+    return array([
+        piece_square_tables[color][piece_type] if color == WHITE else [-value for value in piece_square_tables[color][piece_type]]
+        for color, piece_type in piece_planes
+    ])
+
+stacked_tables = stack_piece_square_tables(piece_square_tables)
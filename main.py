@@ -3,12 +3,15 @@ from mouse import *
 from bot import *
 import pygame as pg
 import argparse
+import threading
 from chess import BLACK
 
 parser = argparse.ArgumentParser(prog='Chess Bot')
 parser.add_argument('--mode', help="Select the mode, args are \"human-vs-human\", \"human-vs-bot\", and \"bot-vs-bot\"")
 parser.add_argument('--color', help="Select what color you want to play, args are \"white\" and \"black\"")
 parser.add_argument('--fen', help="Select the starting position of the game, this is an optional argument")
+parser.add_argument('--book', help="Polyglot opening book for the bot, this is an optional argument")
+parser.add_argument('--syzygy', help="Directory with syzygy endgame tablebases for the bot, this is an optional argument")
 args = parser.parse_args()
 
 if not (args.mode in ["human-vs-human", "human-vs-bot", "bot-vs-bot"]):
@@ -17,6 +20,9 @@ if not (args.mode in ["human-vs-human", "human-vs-bot", "bot-vs-bot"]):
 if args.mode == "human-vs-bot" and not(args.color in ["white", "black"]):
     raise ValueError("Please select white or black")
 
+# posted by the search thread when the bot has found its move
+BOT_MOVE_EVENT = pg.USEREVENT + 1
+
 class App():
     def __init__(self):
         pg.init()
@@ -32,10 +38,17 @@ class App():
         # class attributes
         self.board = chess.Board()
         self.mouse = Mouse(self)
-        self.bot = ChessBot(BLACK)
+        self.bot = ChessBot(BLACK, progress_callback=self.search_progress, book_path=args.book, tablebase_path=args.syzygy)
+
+        # the bot searches on its own thread so the window keeps handling events while it thinks
+        self.search_thread = None
+        self.search_generation = 0
+        self.search_info = {}
 
         # game information
         self.piece_to_promote_to = "q"
+        self.theme = list(color_themes.values()).index([COLOR1, COLOR2])
+        self.colors = COLOR1, COLOR2
 
         # init stuff
         if args.fen != None: self.board.set_board_fen(args.fen)
@@ -49,28 +62,41 @@ class App():
 
             exit()
 
-    def make_move(self, move, first_square, second_square, piece):
-        
-        # if the move is irregular like an en passant or castling then the whole board needs to be redrawn
-        if self.board.is_en_passant(chess.Move.from_uci(move)) or self.board.is_castling(chess.Move.from_uci(move)) or chess.Move.from_uci(move).promotion != None:
-            self.play_move(move)
-            self.draw_board()
-            pg.display.update()
-            return
+    def changed_squares(self, move):
+        # castling also moves the rook and en passant removes the pawn behind the target square
+        squares = [move.from_square, move.to_square]
+        rank = chess.square_rank(move.from_square)
 
+        if self.board.is_kingside_castling(move):
+            squares += [chess.square(7, rank), chess.square(5, rank)]
+        elif self.board.is_queenside_castling(move):
+            squares += [chess.square(0, rank), chess.square(3, rank)]
+        elif self.board.is_en_passant(move):
+            squares.append(chess.square(chess.square_file(move.to_square), rank))
+
+        return squares
+
+    def make_move(self, move, first_square, second_square):
+        squares = self.changed_squares(chess.Move.from_uci(move))
         self.play_move(move)
 
-        # if the move is a normal move you can get away with redrawing only the tiles that were moved since
-        # there is no need to redraw the whole board...
+        # only the tiles the move changed are redrawn, this covers castling, en passant and promotions too
         if self.mouse.last_selected != None: self.draw_tile(self.mouse.last_selected, outline=HIGHLIGHT_THICKNESS)
-        self.draw_tile(first_square)
-        self.draw_tile(second_square)
+        for square in squares:
+            self.draw_square(square)
         self.draw_tile(second_square, color=LAST_MOVE_HIGHLIGHT, outline=HIGHLIGHT_THICKNESS)
-        self.draw_piece(second_square, piece)
 
         # update the screen
         pg.display.update()
 
+    def draw_square(self, square):
+        coordinates = self.mouse.square_to_coord(square)
+        self.draw_tile(coordinates)
+
+        piece = self.board.piece_at(square)
+        if piece:
+            self.draw_piece(coordinates, piece.symbol())
+
     def draw_piece(self, coordinates, piece_string):
         key = {"K": 0, "P": 1, "N": 2, "B": 3, "R": 4, "Q": 5, "k": 6, "p": 7, "n": 8, "b": 9, "r": 10, "q": 11}
 
@@ -89,9 +115,9 @@ class App():
         
         if color == None:
             if (coordinates[0] + coordinates[1]) % 2 == 0: 
-                color = COLOR1
+                color = self.colors[0]
             else:
-                color = COLOR2
+                color = self.colors[1]
 
         pg.draw.rect(self.screen, color, (coordinates[0]*TILESIZE, coordinates[1]*TILESIZE, TILESIZE, TILESIZE), outline)
 
@@ -102,11 +128,8 @@ class App():
                 self.draw_tile((rank, file))
         
 
-        for rank, row in enumerate(str(self.board).splitlines()):
-            for file, tile in enumerate(row.split(' ')):
-                if tile == ".": continue
-
-                self.draw_piece((file, rank), tile)
+        for square, piece in self.board.piece_map().items():
+            self.draw_piece(self.mouse.square_to_coord(square), piece.symbol())
         
         pg.display.update()
 
@@ -114,8 +137,12 @@ class App():
         # exit pygame is the window is closed
         for event in pg.event.get():
             if event.type == pg.QUIT:
+                self.cancel_bot_search()
                 exit()
 
+            if event.type == BOT_MOVE_EVENT:
+                self.finish_bot_search(event)
+
             if event.type == pg.MOUSEBUTTONDOWN:
                 piece_at_square = str(self.board.piece_at(self.mouse.square))
 
@@ -143,8 +170,10 @@ class App():
             if event.type == pg.KEYDOWN:
                 # undo moves if there are moves to undo and this is not bot vs bot
                 if event.key == pg.K_z and self.board.move_stack != [] and self.mode != "bot-vs-bot":
-                    # need to undo the bots move as well so undo 1 extra move
-                    if self.mode == "human-vs-bot":
+                    # need to undo the bots move as well so undo 1 extra move, unless the bot is still thinking
+                    if self.search_thread != None:
+                        self.cancel_bot_search()
+                    elif self.mode == "human-vs-bot":
                         self.board.pop()
                         
                     self.board.pop()
@@ -159,6 +188,54 @@ class App():
 
                 if event.key == pg.K_e: print(f"Material advantage: {self.bot.evaluate(self.board)}")
 
+                # cycle through the color themes
+                if event.key == pg.K_t:
+                    self.theme = (self.theme + 1) % len(color_themes)
+                    self.colors = tuple(list(color_themes.values())[self.theme])
+                    self.draw_board()
+
+    def start_bot_search(self):
+        self.search_generation += 1
+        self.search_info = {}
+        self.bot.clear_stop()
+        self.search_thread = threading.Thread(target=self.run_bot_search, args=(self.board.copy(), self.search_generation), daemon=True)
+        self.search_thread.start()
+
+    def run_bot_search(self, board, generation):
+        move = self.bot.get_best_move(board, clear_stop=False)
+
+        # hand the move back to the main thread through pygame's thread safe event queue
+        pg.event.post(pg.event.Event(BOT_MOVE_EVENT, move=move, generation=generation))
+
+    def cancel_bot_search(self):
+        # the bot is stopped and the move it still posts is ignored since the generation no longer matches
+        if self.search_thread != None:
+            self.bot.stop()
+            self.search_thread.join()
+            self.search_thread = None
+            self.search_generation += 1
+
+    def finish_bot_search(self, event):
+        if event.generation != self.search_generation or self.search_thread == None:
+            return
+
+        self.search_thread.join()
+        self.search_thread = None
+        if event.move == None:
+            return
+
+        first_square = self.mouse.square_to_coord(event.move.from_square)
+        second_square = self.mouse.square_to_coord(event.move.to_square)
+
+        self.make_move(str(event.move), first_square, second_square)
+        self.mouse.last_selected = second_square
+
+    def search_progress(self, info):
+        # called from the search thread, the caption shows the latest completed iteration
+        print_progress(info)
+        if info["type"] == "iteration":
+            self.search_info = {"depth": info["depth"], "move": info["board"].san(info["move"])}
+
     def update(self):
         # player plays both sides
         if self.mode == "human-vs-human":
@@ -170,26 +247,13 @@ class App():
                 self.mouse.update()
 
             # bots turn
-            else:
-                move_object = self.bot.get_best_move(self.board)
-
-                piece = str(self.board.piece_at(move_object.from_square))
-                first_square = self.mouse.square_to_coord(move_object.from_square)
-                second_square = self.mouse.square_to_coord(move_object.to_square)
-
-                self.make_move(str(move_object), first_square, second_square, piece)
-                self.mouse.last_selected = second_square
+            elif self.search_thread == None:
+                self.start_bot_search()
 
         # bot plays both sides
         elif self.mode == "bot-vs-bot":
-            move_object = self.bot.get_best_move(self.board)
-
-            piece = str(self.board.piece_at(move_object.from_square))
-            first_square = self.mouse.square_to_coord(move_object.from_square)
-            second_square = self.mouse.square_to_coord(move_object.to_square)
-
-            self.make_move(str(move_object), first_square, second_square, piece)
-            self.mouse.last_selected = second_square
+            if self.search_thread == None:
+                self.start_bot_search()
 
     def run(self):
 
@@ -197,7 +261,17 @@ class App():
             self.handle_events()
             self.update()
             self.clock.tick(FPS)
-            pg.display.set_caption(f"PHONG'S CHESS BOT                      FPS: {str(round(self.clock.get_fps(), 2))}")
+            pg.display.set_caption(f"PHONG'S CHESS BOT                      FPS: {str(round(self.clock.get_fps(), 2))}{self.search_readout()}")
+
+    def search_readout(self):
+        if self.search_thread == None:
+            return ""
+
+        # the node counters are read live while the bot is searching
+        nodes = self.bot.nodes + self.bot.quiescence_nodes if hasattr(self.bot, "nodes") else 0
+        depth = self.search_info.get("depth", 0)
+        move = self.search_info.get("move", "-")
+        return f"      Thinking... depth: {depth}  nodes: {nodes}  best: {move}"
 
 if __name__ == '__main__':
     app = App()
@@ -63,7 +63,7 @@ class Mouse():
                 move = move + self.app.piece_to_promote_to
 
             if chess.Move.from_uci(move) in board.legal_moves:
-                self.app.make_move(move, self.selected, self.tileposition, piece_at_first_square)
+                self.app.make_move(move, self.selected, self.tileposition)
                 self.last_selected = self.tileposition
                 self.deselect_square()
 
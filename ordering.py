@@ -0,0 +1,138 @@
+# external imports
+import chess
+
+# piece values for static exchange evaluation, the king can capture but is never given up
+SEE_VALUES = (0, 1, 3, 3, 5, 9, 100)
+
+# ordering scores, higher scores are searched first
+HASH_MOVE_SCORE = 10_000_000
+CAPTURE_SCORE = 1_000_000
+PROMOTION_SCORE = 900_000
+KILLER_SCORES = (800_000, 799_999)
+HISTORY_LIMIT = 700_000
+
+def static_exchange(board: chess.Board, move: chess.Move) -> int:
+    # material outcome of the capture sequence on the target square when both sides always
+    # recapture with their least valuable attacker and may stop capturing at any point
+    to_square = move.to_square
+    victim = chess.PAWN if board.is_en_passant(move) else board.piece_type_at(to_square)
+    gains = [SEE_VALUES[victim]]
+
+    occupied = board.occupied & ~chess.BB_SQUARES[move.from_square]
+    piece_on_square = board.piece_type_at(move.from_square)
+    color = not board.turn
+
+    while True:
+        # sliding attackers behind pieces that already captured are found through the updated occupancy
+        attackers = board.attackers_mask(color, to_square, occupied) & occupied
+        if not attackers:
+            break
+
+        for piece_type in chess.PIECE_TYPES:
+            attacker_mask = attackers & board.pieces_mask(piece_type, color)
+            if attacker_mask:
+                break
+
+        gains.append(SEE_VALUES[piece_on_square] - gains[-1])
+        piece_on_square = piece_type
+        occupied &= ~chess.BB_SQUARES[chess.lsb(attacker_mask)]
+        color = not color
+
+    # each side only continues the exchange when it pays off
+    while len(gains) > 1:
+        gain = gains.pop()
+        gains[-1] = -max(-gains[-1], gain)
+
+    return gains[0]
+
+class MoveOrderer:
+    def __init__(self, max_ply: int = 128) -> None:
+        self.max_ply = max_ply
+        self.clear()
+
+    def clear(self) -> None:
+        # two killer moves per ply and a history score for every (color, from square, to square)
+        self.killers = [[None, None] for _ in range(self.max_ply)]
+        self.history = [[[0] * 64 for _ in range(64)] for _ in range(2)]
+
+    def new_search(self) -> None:
+        # killers are position specific so they are dropped, history is kept but decays
+        self.killers = [[None, None] for _ in range(self.max_ply)]
+        self.age_history()
+
+    def age_history(self) -> None:
+        for color_table in self.history:
+            for from_table in color_table:
+                for to_square in range(64):
+                    from_table[to_square] //= 2
+
+    def store_killer(self, ply: int, move: chess.Move) -> None:
+        killers = self.killers[ply]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+
+    def update_history(self, color: chess.Color, move: chess.Move, depth: int) -> None:
+        # deeper cutoffs are worth more since they save bigger subtrees
+        from_table = self.history[color][move.from_square]
+        from_table[move.to_square] += depth * depth
+
+        # keep history scores below the killer scores
+        if from_table[move.to_square] > HISTORY_LIMIT:
+            self.age_history()
+
+    def static_score(self, board: chess.Board, move: chess.Move, first_move: chess.Move) -> int:
+        if move == first_move:
+            return HASH_MOVE_SCORE
+        if board.is_capture(move):
+            victim = chess.PAWN if board.is_en_passant(move) else board.piece_type_at(move.to_square)
+            attacker = board.piece_type_at(move.from_square)
+            return CAPTURE_SCORE + 10 * victim - attacker + (move.promotion or 0)
+        if move.promotion:
+            return PROMOTION_SCORE + move.promotion
+        return 0
+
+    def score(self, board: chess.Board, move: chess.Move, ply: int, hash_move: chess.Move) -> int:
+        # hash move, then captures by most valuable victim and least valuable attacker, then promotions
+        static_score = self.static_score(board, move, hash_move)
+        if static_score:
+            return static_score
+
+        killers = self.killers[ply]
+        if move == killers[0]:
+            return KILLER_SCORES[0]
+        if move == killers[1]:
+            return KILLER_SCORES[1]
+
+        return self.history[board.turn][move.from_square][move.to_square]
+
+    def order(self, board: chess.Board, moves: list, ply: int, hash_move: chess.Move = None) -> list:
+        return sorted(moves, key=lambda move: self.score(board, move, ply, hash_move), reverse=True)
+
+    def order_static(self, board: chess.Board, moves: list, first_move: chess.Move = None) -> list:
+        # only uses the position itself, quiet moves keep their move generator order
+        return sorted(moves, key=lambda move: self.static_score(board, move, first_move), reverse=True)
+
+if __name__ == '__main__':
+    # compare the search tree size with and without move ordering on a fixed set of positions
+    from bot import ChessBot
+
+    positions = [
+        chess.STARTING_FEN,
+        "r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3",
+        "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+        "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+        "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+    ]
+    depth = 4
+
+    for fen in positions:
+        results = []
+        for move_ordering in (False, True):
+            bot = ChessBot(chess.BLACK, move_ordering=move_ordering)
+            bot.get_best_move(chess.Board(fen), depth=depth)
+            results.append(bot.nodes)
+
+        # effective branching factor of the whole iterative deepening tree
+        unordered, ordered = results
+        print(f"{fen}\n    unordered: {unordered} nodes (ebf {unordered ** (1 / depth):.2f}), ordered: {ordered} nodes (ebf {ordered ** (1 / depth):.2f}), reduction: {1 - ordered / unordered:.1%}")
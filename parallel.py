@@ -0,0 +1,218 @@
+# external imports
+import chess
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# local imports
+from transposition import score_bound
+
+# per process state of the workers, set up once by the pool initializer
+worker_bot = None
+shared_bound = None
+
+# node budget of the iteration, shared by all workers, and the part of it this worker has already added
+shared_nodes = None
+node_limit = float("inf")
+published_nodes = 0
+
+# search counters of the workers that are added up in the parent process
+COUNTERS = (
+    "nodes", "leaf_nodes", "quiescence_nodes", "cutoffs", "first_move_cutoffs",
+    "null_move_tries", "null_move_cutoffs", "lmr_reductions", "lmr_researches", "pvs_researches", "futility_prunes",
+)
+
+def init_worker(bound, nodes, stop_flag, options: dict) -> None:
+    global worker_bot, shared_bound, shared_nodes
+
+    # imported here since bot imports this module
+    from bot import ChessBot
+
+    # the stop flag of the parent bot is shared so a stop request reaches the running workers
+    worker_bot = ChessBot(chess.BLACK, **options)
+    worker_bot.stop_flag = stop_flag
+    worker_bot.should_stop = should_stop
+    shared_bound = bound
+    shared_nodes = nodes
+
+def publish_nodes() -> None:
+    # the worker's nodes are added to the shared count and its own budget shrinks to what is left of the total
+    global published_nodes
+    searched = worker_bot.nodes + worker_bot.quiescence_nodes
+    with shared_nodes.get_lock():
+        shared_nodes.value += searched - published_nodes
+        total = shared_nodes.value
+    published_nodes = searched
+    worker_bot.max_nodes = searched + max(node_limit - total, 0)
+
+def should_stop() -> bool:
+    # called by the worker's search every 256 nodes
+    if node_limit != float("inf"):
+        publish_nodes()
+    return type(worker_bot).should_stop(worker_bot)
+
+def worker_counters() -> dict:
+    counters = {name: getattr(worker_bot, name) for name in COUNTERS}
+
+    # nodes per ply and the time split of an instrumented search are added up entry by entry
+    counters["ply_nodes"] = worker_bot.ply_nodes
+    counters["search_times"] = worker_bot.search_times
+    return counters
+
+def is_better(evaluation: float, bound: float, maximizing: bool) -> bool:
+    return evaluation > bound if maximizing else evaluation < bound
+
+def search_root_move(fen: str, move_uci: str, depth: int, deadline: float, max_nodes: int, can_abort: bool, deterministic: bool, alpha: float, beta: float, full_window: bool, pv: list, tighten: bool, hash_size_mb: float) -> tuple:
+    from bot import SearchAborted
+    global node_limit, published_nodes
+
+    # fixed depth searches use a table of the same size as the serial search, so positions share buckets the same way
+    if worker_bot.tt.size_mb != hash_size_mb:
+        worker_bot.tt.resize(hash_size_mb)
+
+    board = worker_bot.search_board(chess.Board(fen))
+    move = chess.Move.from_uci(move_uci)
+    maximizing = board.turn == chess.WHITE
+
+    # the deadline is wall clock time since perf_counter isn't comparable between processes
+    worker_bot.start_search(board, deadline - time.time(), max_nodes, deterministic)
+    worker_bot.can_abort = can_abort
+    node_limit = max_nodes or float("inf")
+    published_nodes = 0
+    if node_limit != float("inf"):
+        publish_nodes()
+
+    # the worker searching the previous iteration's best move follows its principal variation like the serial search
+    worker_bot.pv_moves = [chess.Move.from_uci(uci) for uci in pv]
+    worker_bot.following_pv = bool(pv)
+
+    # timed searches only prove that this move is better than the best root move found by any worker so far
+    if tighten:
+        if maximizing:
+            alpha = max(alpha, shared_bound.value)
+        else:
+            beta = min(beta, shared_bound.value)
+
+    try:
+        evaluation = worker_bot.search_move(board, move, depth, alpha, beta, full_window)
+    except SearchAborted:
+        return None, (alpha, beta), worker_counters(), []
+    finally:
+        if node_limit != float("inf"):
+            publish_nodes()
+
+    # a score inside the window is exact, so it can tighten the bound for the other workers
+    if alpha < evaluation < beta:
+        with shared_bound.get_lock():
+            if is_better(evaluation, shared_bound.value, maximizing):
+                shared_bound.value = evaluation
+
+    board.push(move)
+    variation = [pv_move.uci() for pv_move in worker_bot.principal_variation(board, depth - 1, ply=1)]
+
+    return evaluation, (alpha, beta), worker_counters(), variation
+
+class ParallelSearch:
+    def __init__(self, workers: int, options: dict, stop_flag) -> None:
+        self.workers = workers
+
+        # the pool is started from the search thread, a forked worker can inherit a lock another thread of the parent
+        # held at the time, like the one on a piped stdin, and hang. spawned workers start from a fresh interpreter
+        context = multiprocessing.get_context("spawn")
+        self.bound = context.Value("d", 0.0)
+        self.nodes = context.Value("q", 0)
+
+        # every worker gets its own transposition table with an equal share of the hash size
+        options = dict(options, hash_size_mb=options["hash_size_mb"] / workers)
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=context,
+            initializer=init_worker,
+            initargs=(self.bound, self.nodes, stop_flag, options),
+        )
+
+    def add_counters(self, bot, counters: dict) -> None:
+        for name, value in counters.items():
+            if name == "ply_nodes":
+                bot.ply_nodes = [total + count for total, count in zip(bot.ply_nodes, value)]
+            elif name == "search_times":
+                for category, seconds in value.items():
+                    bot.search_times[category] += seconds
+            else:
+                setattr(bot, name, getattr(bot, name) + value)
+
+    def close(self) -> None:
+        self.executor.shutdown(cancel_futures=True)
+
+    def search_root(self, bot, board: chess.Board, depth: int, moves: list, alpha: float = float("-inf"), beta: float = float("inf")) -> tuple:
+        from bot import SearchAborted
+
+        maximizing = board.turn == chess.WHITE
+        bot.ply_nodes[0] += 1
+
+        # workers receive the position as a fen instead of a pickled board with its whole move stack
+        fen = board.fen()
+        deadline = time.time() + (bot.deadline - time.perf_counter())
+        # the workers draw from one node budget instead of each getting all of what is left
+        max_nodes = bot.max_nodes - bot.nodes - bot.quiescence_nodes if bot.max_nodes != float("inf") else None
+        self.nodes.value = 0
+        pv = [move.uci() for move in bot.pv_moves] if bot.following_pv else []
+        bot.following_pv = False
+        hash_size_mb = bot.hash_size_mb if bot.deterministic else bot.hash_size_mb / self.workers
+
+        def submit(index: int, window: tuple, tighten: bool = False):
+            return self.executor.submit(
+                search_root_move, fen, moves[index].uci(), depth, deadline, max_nodes, bot.can_abort, bot.deterministic,
+                *window, index == 0, pv if index == 0 else [], tighten, hash_size_mb,
+            )
+
+        def collect(futures: list) -> list:
+            results = [future.result() for future in futures]
+            for _, _, counters, _ in results:
+                self.add_counters(bot, counters)
+            if any(evaluation is None for evaluation, *_ in results):
+                raise SearchAborted()
+            return results
+
+        if bot.deterministic:
+            # fixed depth searches give every root move after the first the same window, the one left by the first
+            # move's score, and search every root move from empty tables, in the serial search too. null move pruning
+            # and late move reductions depend on both, so this keeps the scores the same as the serial search's
+            results = collect([submit(0, (alpha, beta))])
+            first_evaluation = results[0][0]
+            window = (max(alpha, first_evaluation), beta) if maximizing else (alpha, min(beta, first_evaluation))
+            if window[0] < window[1]:
+                results += collect([submit(index, window) for index in range(1, len(moves))])
+        else:
+            # root moves are handed out in order, so the most promising moves tighten the bound early
+            self.bound.value = alpha if maximizing else beta
+            results = collect([submit(index, (alpha, beta), tighten=True) for index in range(len(moves))])
+
+            # a move that only matched the bound it was searched with might be worse than that bound, so the first
+            # root moves reaching the best score are re-searched with the root window until one of them keeps it
+            best_evaluation = max(result[0] for result in results) if maximizing else min(result[0] for result in results)
+            for index, (evaluation, window, _, _) in enumerate(results):
+                if evaluation != best_evaluation:
+                    continue
+                if window == (alpha, beta) or (evaluation > window[0] if maximizing else evaluation < window[1]):
+                    break
+                results[index] = collect([submit(index, (alpha, beta))])[0]
+                if results[index][0] == best_evaluation:
+                    break
+
+        # the results are gone through in root move order like the serial search does, so the first root move
+        # reaching the best score is picked and a score outside of an aspiration window ends the iteration early
+        best_index = None
+        for index, (evaluation, *_) in enumerate(results):
+            if best_index is None or is_better(evaluation, results[best_index][0], maximizing):
+                best_index = index
+            best_evaluation = results[best_index][0]
+            if best_evaluation >= beta if maximizing else best_evaluation <= alpha:
+                results = results[:index + 1]
+                break
+
+        move, variation = moves[best_index], results[best_index][3]
+        bot.root_evaluations = [(root_move, evaluation, score_bound(evaluation, *window)) for root_move, (evaluation, window, _, _) in zip(moves, results)]
+        bot.pv_moves = [move] + [chess.Move.from_uci(uci) for uci in variation]
+
+        return move, best_evaluation
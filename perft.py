@@ -0,0 +1,131 @@
+# external imports
+import argparse
+import chess
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# local imports
+from bot import ChessBot
+
+# known node counts of the standard perft positions, indexed by depth - 1
+reference_counts = {
+    "startpos": (chess.STARTING_FEN, (20, 400, 8902, 197281, 4865609, 119060324)),
+    "kiwipete": ("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1", (48, 2039, 97862, 4085603, 193690690)),
+    "position3": ("8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", (14, 191, 2812, 43238, 674624, 11030083)),
+    "position4": ("r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1", (6, 264, 9467, 422333, 15833292)),
+    "position4_mirrored": ("r2q1rk1/pP1p2pp/Q4n2/bbp1p3/Np6/1B3NBn/pPPP1PPP/R3K2R b KQ - 0 1", (6, 264, 9467, 422333, 15833292)),
+    "position5": ("rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8", (44, 1486, 62379, 2103487, 89941194)),
+    "position6": ("r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10", (46, 2079, 89890, 3894594, 164075551)),
+}
+
+# one bot per process for the parallel root split
+worker_bot = None
+
+def init_worker(backend: str) -> None:
+    global worker_bot
+    worker_bot = ChessBot(chess.BLACK, backend=backend)
+
+def perft(bot: ChessBot, board, depth: int, bulk: bool = True) -> int:
+    # moves are played through the bot's push and pop, the same path the search uses
+    if depth == 0:
+        return 1
+
+    moves = list(board.legal_moves)
+    if bulk and depth == 1:
+        # the leaves only need to be counted, not played
+        return len(moves)
+
+    nodes = 0
+    for move in moves:
+        bot.push(board, move)
+        nodes += perft(bot, board, depth - 1, bulk)
+        bot.pop(board)
+    return nodes
+
+def perft_root_move(fen: str, move_uci: str, depth: int, bulk: bool) -> tuple:
+    board = worker_bot.search_board(chess.Board(fen))
+    worker_bot.material_stack = [worker_bot.material(board)]
+
+    worker_bot.push(board, chess.Move.from_uci(move_uci))
+    nodes = perft(worker_bot, board, depth - 1, bulk)
+    worker_bot.pop(board)
+    return move_uci, nodes
+
+def divide(fen: str, depth: int, bulk: bool = True, workers: int = 1, backend: str = "python-chess") -> dict:
+    # node counts of the subtree below every root move
+    moves = [move.uci() for move in chess.Board(fen).legal_moves]
+
+    if workers == 1:
+        init_worker(backend)
+        return dict(perft_root_move(fen, move, depth, bulk) for move in moves)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(backend,)) as executor:
+        futures = [executor.submit(perft_root_move, fen, move, depth, bulk) for move in moves]
+        return dict(future.result() for future in futures)
+
+def run_perft(fen: str, depth: int, bulk: bool = True, workers: int = 1, backend: str = "python-chess") -> dict:
+    start_time = time.perf_counter()
+    if depth == 0:
+        counts = {}
+        nodes = 1
+    else:
+        counts = divide(fen, depth, bulk, workers, backend)
+        nodes = sum(counts.values())
+    elapsed = time.perf_counter() - start_time
+
+    return {
+        "fen": fen,
+        "depth": depth,
+        "divide": counts,
+        "nodes": nodes,
+        "time": elapsed,
+        "nps": nodes / elapsed if elapsed > 0 else 0,
+        "expected": expected_count(fen, depth),
+    }
+
+def expected_count(fen: str, depth: int) -> int:
+    # positions are matched without the move counters
+    position = " ".join(fen.split()[:4])
+    for reference_fen, counts in reference_counts.values():
+        if " ".join(reference_fen.split()[:4]) == position and 0 < depth <= len(counts):
+            return counts[depth - 1]
+    return None
+
+def print_result(result: dict, show_divide: bool = False) -> bool:
+    if show_divide:
+        for move, nodes in sorted(result["divide"].items()):
+            print(f"{move}: {nodes}")
+        print()
+
+    if result["expected"] is None:
+        status = "no reference count"
+    elif result["expected"] == result["nodes"]:
+        status = "ok"
+    else:
+        status = f"FAILED, expected {result['expected']}"
+
+    print(f"depth {result['depth']} nodes {result['nodes']:>10} time {result['time']:7.3f}s nps {result['nps']:>9.0f}  {status}  {result['fen']}")
+    return result["expected"] is None or result["expected"] == result["nodes"]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog='perft', description="Count the leaf nodes of the legal move tree to check and time move generation")
+    parser.add_argument('fen', nargs='?', help="Position to count, runs all reference positions when omitted")
+    parser.add_argument('--depth', type=int, default=4, help="Depth to count to, reference positions are capped at their deepest known count")
+    parser.add_argument('--divide', action='store_true', help="Print the node count below every root move")
+    parser.add_argument('--no-bulk', action='store_true', help="Play out the last ply instead of counting the legal moves")
+    parser.add_argument('--workers', type=int, default=1, help="Number of processes the root moves are split over")
+    parser.add_argument('--backend', default="python-chess", choices=("python-chess", "bitboard"), help="Board representation to count with")
+    args = parser.parse_args()
+
+    if args.fen:
+        jobs = [(args.fen, args.depth)]
+    else:
+        jobs = [(fen, min(args.depth, len(counts))) for fen, counts in reference_counts.values()]
+
+    passed = True
+    for fen, depth in jobs:
+        result = run_perft(fen, depth, not args.no_bulk, args.workers, args.backend)
+        passed = print_result(result, args.divide) and passed
+
+    if not passed:
+        exit(1)
@@ -0,0 +1,92 @@
+# external imports
+import chess
+import chess.polyglot
+import chess.syzygy
+import random
+
+# score given to tablebase wins since they aren't necessarily a mate within the search horizon
+TABLEBASE_WIN = 100
+
+class ProbeLayer:
+    def __init__(self, book_path: str = None, tablebase_path: str = None, book_policy: str = "weighted", book_min_weight: int = 1, seed: int = None) -> None:
+        if book_policy not in ("best", "weighted", "uniform"):
+            raise ValueError("Please select a book policy of best, weighted or uniform")
+
+        # the polyglot reader memory maps the book and binary searches it by zobrist key,
+        # so opening a large book costs nothing until a position is looked up
+        self.book = chess.polyglot.open_reader(book_path) if book_path else None
+        self.book_policy = book_policy
+        self.book_min_weight = book_min_weight
+        self.random = random.Random(seed)
+
+        self.tablebase = chess.syzygy.open_tablebase(tablebase_path) if tablebase_path else None
+        self.tablebase_pieces = self.largest_table() if self.tablebase else 0
+
+    def close(self) -> None:
+        if self.book is not None:
+            self.book.close()
+        if self.tablebase is not None:
+            self.tablebase.close()
+
+    def largest_table(self) -> int:
+        # table names look like KQvKR, every letter except the v is a piece
+        return max((len(name) - 1 for name in self.tablebase.wdl), default=0)
+
+    def probe_book(self, board: chess.Board) -> chess.Move:
+        entries = list(self.book.find_all(board, minimum_weight=self.book_min_weight))
+        if not entries:
+            return None
+
+        if self.book_policy == "best":
+            return max(entries, key=lambda entry: entry.weight).move
+        if self.book_policy == "uniform":
+            return self.random.choice(entries).move
+
+        # weighted: moves are picked in proportion to how often they were played
+        return self.random.choices(entries, weights=[entry.weight for entry in entries])[0].move
+
+    def probe_tablebase(self, board: chess.Board) -> tuple:
+        if chess.popcount(board.occupied) > self.tablebase_pieces or board.castling_rights:
+            return None
+
+        best = None
+        try:
+            for move in board.legal_moves:
+                board.push(move)
+                try:
+                    if board.is_checkmate():
+                        return move, 2
+                    # win/draw/loss and distance to zeroing from the point of view of the side that moved
+                    wdl = -self.tablebase.probe_wdl(board)
+                    dtz = -self.tablebase.probe_dtz(board)
+                finally:
+                    board.pop()
+
+                # win as fast as possible, lose as slowly as possible
+                key = (wdl, -abs(dtz) if wdl > 0 else abs(dtz))
+                if best is None or key > best[0]:
+                    best = (key, move, wdl)
+        except KeyError:
+            # a table for one of the positions is missing
+            return None
+
+        if best is None:
+            return None
+        return best[1], best[2]
+
+    def probe(self, board: chess.Board) -> tuple:
+        # returns the move, where it came from and its score from white's point of view, or None to search
+        if self.book is not None:
+            move = self.probe_book(board)
+            if move is not None:
+                return move, "book", None
+
+        if self.tablebase is not None:
+            result = self.probe_tablebase(board)
+            if result is not None:
+                # cursed wins and blessed losses are draws under the fifty move rule
+                move, wdl = result
+                score = TABLEBASE_WIN if wdl == 2 else (-TABLEBASE_WIN if wdl == -2 else 0)
+                return move, "tablebase", score if board.turn == chess.WHITE else -score
+
+        return None
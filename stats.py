@@ -0,0 +1,120 @@
+# external imports
+import json
+import time
+
+# bot methods that are timed when the search is instrumented, by what they spend their time on
+TIMED_METHODS = {
+    "evaluate_incremental": "evaluate",
+    "legal_moves": "movegen",
+    "legal_captures": "movegen",
+    "push": "push_pop",
+    "push_null": "push_pop",
+    "pop": "push_pop",
+}
+
+def timed(bot, function, category: str):
+    clock = time.perf_counter
+
+    def wrapper(*args):
+        start = clock()
+        result = function(*args)
+        bot.search_times[category] += clock() - start
+        return result
+
+    return wrapper
+
+def instrument(bot) -> None:
+    # the methods are wrapped on the instance, so a bot that isn't instrumented runs them without any timing overhead
+    for name, category in TIMED_METHODS.items():
+        setattr(bot, name, timed(bot, getattr(bot, name), category))
+
+class SearchStats:
+    def __init__(self, bot, board, move, elapsed: float) -> None:
+        self.fen = board.fen()
+        self.move = move
+        self.source = bot.move_source
+        self.depth = bot.completed_depth
+        self.score = bot.best_evaluation
+        self.time = elapsed
+
+        # main search nodes by their distance from the root, the root is counted once per search of it
+        self.nodes = bot.nodes
+        self.leaf_nodes = bot.leaf_nodes
+        self.quiescence_nodes = bot.quiescence_nodes
+        self.ply_nodes = list(bot.ply_nodes)
+        while self.ply_nodes and self.ply_nodes[-1] == 0:
+            self.ply_nodes.pop()
+        self.iteration_nodes = list(bot.iteration_nodes)
+
+        self.cutoffs = bot.cutoffs
+        self.first_move_cutoffs = bot.first_move_cutoffs
+        self.null_move_tries = bot.null_move_tries
+        self.null_move_cutoffs = bot.null_move_cutoffs
+        self.lmr_reductions = bot.lmr_reductions
+        self.lmr_researches = bot.lmr_researches
+        self.pvs_researches = bot.pvs_researches
+        self.futility_prunes = bot.futility_prunes
+        self.aspiration_researches = bot.aspiration_researches
+        self.tt_hits = bot.tt.hits
+        self.tt_misses = bot.tt.misses
+        self.eval_cache_hit_rate = bot.eval_cache.hit_rate() if bot.eval_cache is not None else None
+
+        # seconds spent in evaluation, move generation and push/pop, only measured by an instrumented bot
+        self.times = dict(bot.search_times) if bot.instrumented else None
+
+    @property
+    def first_move_cutoff_rate(self) -> float:
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0
+
+    @property
+    def effective_branching_factor(self) -> float:
+        # growth of the node count from one iteration of the iterative deepening to the next
+        if len(self.iteration_nodes) < 2:
+            return None
+        previous = self.iteration_nodes[-2] - (self.iteration_nodes[-3] if len(self.iteration_nodes) > 2 else 0)
+        last = self.iteration_nodes[-1] - self.iteration_nodes[-2]
+        return last / previous if previous else None
+
+    @property
+    def nps(self) -> float:
+        return (self.nodes + self.quiescence_nodes) / self.time if self.time > 0 else 0
+
+    def to_dict(self) -> dict:
+        times = None
+        if self.times is not None:
+            times = dict(self.times, other=max(self.time - sum(self.times.values()), 0))
+
+        return {
+            "fen": self.fen,
+            "move": self.move.uci() if self.move else None,
+            "source": self.source,
+            "depth": self.depth,
+            # json has no infinity, mates are written as a score of plus or minus 1000 pawns
+            "score": max(min(self.score, 1000), -1000),
+            "time": self.time,
+            "nodes": self.nodes,
+            "leaf_nodes": self.leaf_nodes,
+            "quiescence_nodes": self.quiescence_nodes,
+            "ply_nodes": self.ply_nodes,
+            "iteration_nodes": self.iteration_nodes,
+            "nps": self.nps,
+            "effective_branching_factor": self.effective_branching_factor,
+            "cutoffs": self.cutoffs,
+            "first_move_cutoff_rate": self.first_move_cutoff_rate,
+            "null_move_tries": self.null_move_tries,
+            "null_move_cutoffs": self.null_move_cutoffs,
+            "lmr_reductions": self.lmr_reductions,
+            "lmr_researches": self.lmr_researches,
+            "pvs_researches": self.pvs_researches,
+            "futility_prunes": self.futility_prunes,
+            "aspiration_researches": self.aspiration_researches,
+            "tt_hits": self.tt_hits,
+            "tt_misses": self.tt_misses,
+            "eval_cache_hit_rate": self.eval_cache_hit_rate,
+            "times": times,
+        }
+
+    def write(self, path: str) -> None:
+        # one json object per searched move, appended so a whole game ends up in one file
+        with open(path, "a") as file:
+            file.write(json.dumps(self.to_dict()) + "\n")
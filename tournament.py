@@ -0,0 +1,346 @@
+# external imports
+import argparse
+import chess
+import chess.pgn
+import datetime
+import math
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+# local imports
+from bot import ChessBot
+from analyze import parse_position, read_positions
+
+# engine settings that limit each search, everything else is passed on to ChessBot
+SEARCH_LIMITS = {"depth": "depth", "movetime": "time_limit", "nodes": "max_nodes"}
+
+# games are adjudicated once the outcome is clear, a value of 0 switches a rule off
+DEFAULT_RULES = {
+    "max_moves": 200,
+    "resign_score": 10,
+    "resign_plies": 6,
+    "draw_score": 0.1,
+    "draw_plies": 16,
+    "draw_start": 40,
+}
+
+# closest a match score gets to 0 or 1 when it is converted to elo, which caps the elo at about 1200
+SCORE_EPSILON = 0.001
+
+def parse_value(text: str):
+    if text.lower() in ("true", "false"):
+        return text.lower() == "true"
+    for value_type in (int, float):
+        try:
+            return value_type(text)
+        except ValueError:
+            pass
+    return text
+
+def parse_engine(spec: str, default_name: str) -> dict:
+    # comma or space separated key=value pairs, e.g. "name=no-lmr depth=4 late_move_reductions=false"
+    engine = {"name": default_name, "limits": {}, "options": {}}
+
+    for token in spec.replace(",", " ").split():
+        if "=" not in token:
+            raise ValueError(f"Please give engine settings as key=value, not {token}")
+        key, value = token.split("=", 1)
+
+        if key == "name":
+            engine["name"] = value
+        elif key in SEARCH_LIMITS:
+            engine["limits"][SEARCH_LIMITS[key]] = parse_value(value)
+        else:
+            engine["options"][key] = parse_value(value)
+
+    # fails here instead of in every worker when an option doesn't exist
+    ChessBot(chess.BLACK, **engine["options"]).close()
+    return engine
+
+def adjudicate(plies: int, scores: list, rules: dict) -> tuple:
+    # scores are the evaluations of the searching side after every move, from white's point of view
+    if rules["max_moves"] and plies >= rules["max_moves"] * 2:
+        return "1/2-1/2", "move limit"
+
+    resign_plies = rules["resign_plies"]
+    if rules["resign_score"] and resign_plies and len(scores) >= resign_plies:
+        recent = scores[-resign_plies:]
+        if all(score >= rules["resign_score"] for score in recent):
+            return "1-0", "resign"
+        if all(score <= -rules["resign_score"] for score in recent):
+            return "0-1", "resign"
+
+    draw_plies = rules["draw_plies"]
+    if draw_plies and plies >= rules["draw_start"] * 2 and len(scores) >= draw_plies:
+        if all(abs(score) <= rules["draw_score"] for score in scores[-draw_plies:]):
+            return "1/2-1/2", "draw by score"
+
+    return None
+
+def load_openings(stream) -> list:
+    # epd records are turned into fens up front, so a bad line fails before any game is played
+    return [parse_position(line)[0].fen() for _, line in read_positions(stream)]
+
+def play_game(index: int, opening: str, white: dict, black: dict, rules: dict) -> dict:
+    board = chess.Board(opening)
+    bots = {
+        chess.WHITE: ChessBot(chess.WHITE, **white["options"]),
+        chess.BLACK: ChessBot(chess.BLACK, **black["options"]),
+    }
+    limits = {chess.WHITE: white["limits"], chess.BLACK: black["limits"]}
+    moves = []
+    scores = []
+    start_time = time.perf_counter()
+
+    while True:
+        outcome = board.outcome(claim_draw=True)
+        if outcome is not None:
+            result, termination = outcome.result(), outcome.termination.name.lower().replace("_", " ")
+            break
+
+        adjudication = adjudicate(len(moves), scores, rules)
+        if adjudication is not None:
+            result, termination = adjudication
+            break
+
+        bot = bots[board.turn]
+        move = bot.get_best_move(board, **limits[board.turn])
+        moves.append(move.uci())
+        scores.append(bot.best_evaluation)
+        board.push(move)
+
+    for bot in bots.values():
+        bot.close()
+
+    return {
+        "index": index,
+        "opening": opening,
+        "white": white["name"],
+        "black": black["name"],
+        "moves": moves,
+        "scores": scores,
+        "result": result,
+        "termination": termination,
+        "time": time.perf_counter() - start_time,
+    }
+
+def game_pgn(game: dict) -> chess.pgn.Game:
+    pgn = chess.pgn.Game.from_board(chess.Board(game["opening"]))
+    pgn.headers["Event"] = "Self-play tournament"
+    pgn.headers["Site"] = "?"
+    pgn.headers["Date"] = datetime.date.today().strftime("%Y.%m.%d")
+    pgn.headers["Round"] = str(game["index"] + 1)
+    pgn.headers["White"] = game["white"]
+    pgn.headers["Black"] = game["black"]
+    pgn.headers["Result"] = game["result"]
+    pgn.headers["Termination"] = game["termination"]
+    pgn.headers["PlyCount"] = str(len(game["moves"]))
+
+    # every move carries the evaluation of the side that played it, from white's point of view
+    node = pgn
+    for move, score in zip(game["moves"], game["scores"]):
+        node = node.add_variation(chess.Move.from_uci(move))
+        node.comment = f"{score:+.2f}" if not math.isinf(score) else ("+mate" if score > 0 else "-mate")
+    return pgn
+
+def score_elo(score: float) -> float:
+    if score <= 0:
+        return float("-inf")
+    if score >= 1:
+        return float("inf")
+    return 400 * math.log10(score / (1 - score))
+
+def elo_summary(wins: int, draws: int, losses: int) -> dict:
+    # elo difference of the first engine with a 95% confidence interval
+    games = wins + draws + losses
+    if games == 0:
+        return {"games": 0, "score": 0.5, "elo": 0, "error": float("inf")}
+
+    score = (wins + draws / 2) / games
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+
+    # floored like in the sprt, so a match where every game had the same result still gets an error margin
+    variance = max(variance, 0.01)
+    margin = 1.96 * math.sqrt(variance / games)
+
+    # scores are kept inside (0, 1) so a match without a win or without a loss gets a finite elo
+    def clamp(value: float) -> float:
+        return min(max(value, SCORE_EPSILON), 1 - SCORE_EPSILON)
+
+    return {
+        "games": games,
+        "score": score,
+        "elo": score_elo(clamp(score)),
+        "error": (score_elo(clamp(score + margin)) - score_elo(clamp(score - margin))) / 2,
+    }
+
+def sprt(wins: int, draws: int, losses: int, elo0: float, elo1: float, alpha: float = 0.05, beta: float = 0.05) -> dict:
+    # log likelihood ratio of elo1 against elo0 with the normal approximation of the game results
+    lower = math.log(beta / (1 - alpha))
+    upper = math.log((1 - beta) / alpha)
+    games = wins + draws + losses
+    llr = 0
+
+    if games:
+        score = (wins + draws / 2) / games
+        variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+
+        # when every game had the same result the variance is floored, so a one-sided match can still be decided
+        variance = max(variance, 0.01)
+        score0 = 1 / (1 + 10 ** (-elo0 / 400))
+        score1 = 1 / (1 + 10 ** (-elo1 / 400))
+        llr = games * (score1 - score0) * (2 * score - score0 - score1) / (2 * variance)
+
+    if llr >= upper:
+        status = "H1 accepted"
+    elif llr <= lower:
+        status = "H0 accepted"
+    else:
+        status = "continue"
+    return {"llr": llr, "lower": lower, "upper": upper, "status": status}
+
+def schedule(openings: list, first: dict, second: dict, games: int, rules: dict):
+    # every opening is played twice with the colours swapped, the openings repeat when there are more games
+    for index in range(games):
+        opening = openings[(index // 2) % len(openings)]
+        if index % 2 == 0:
+            yield index, opening, first, second, rules
+        else:
+            yield index, opening, second, first, rules
+
+class Tournament:
+    def __init__(self, first: dict, second: dict, pgn_output, log=sys.stderr, sprt_bounds: tuple = None) -> None:
+        self.first = first
+        self.second = second
+        self.pgn_output = pgn_output
+        self.log = log
+        self.sprt_bounds = sprt_bounds
+
+        # results from the first engine's point of view
+        self.wins = 0
+        self.draws = 0
+        self.losses = 0
+        self.terminations = {}
+        self.start_time = time.perf_counter()
+
+    def record(self, game: dict) -> None:
+        first_white = game["white"] == self.first["name"]
+        if game["result"] == "1/2-1/2":
+            self.draws += 1
+        elif (game["result"] == "1-0") == first_white:
+            self.wins += 1
+        else:
+            self.losses += 1
+        self.terminations[game["termination"]] = self.terminations.get(game["termination"], 0) + 1
+
+        # games are written as soon as they finish so a long run can be followed and cut short
+        print(game_pgn(game), file=self.pgn_output, end="\n\n")
+        self.pgn_output.flush()
+
+        elo = elo_summary(self.wins, self.draws, self.losses)
+        print(f"Game {game['index'] + 1}: {game['white']} - {game['black']} {game['result']} ({game['termination']}, {len(game['moves'])} plies, {game['time']:.1f}s)  "
+              f"score +{self.wins} ={self.draws} -{self.losses}  elo {elo['elo']:+.1f} +/- {elo['error']:.1f}  {self.games_per_hour():.0f} games/hour", file=self.log)
+        self.log.flush()
+
+    def games_per_hour(self) -> float:
+        elapsed = time.perf_counter() - self.start_time
+        return (self.wins + self.draws + self.losses) / elapsed * 3600 if elapsed > 0 else 0
+
+    def sprt_result(self) -> dict:
+        if self.sprt_bounds is None:
+            return None
+        return sprt(self.wins, self.draws, self.losses, *self.sprt_bounds)
+
+    def finished(self) -> bool:
+        # an sprt that accepted either hypothesis ends the tournament early
+        result = self.sprt_result()
+        return result is not None and result["status"] != "continue"
+
+    def run(self, jobs, workers: int = 1) -> dict:
+        if workers == 1:
+            for job in jobs:
+                if self.finished():
+                    break
+                self.record(play_game(*job))
+            return self.summary()
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # only a couple of games per worker are in flight, so an early sprt stop wastes little work
+            pending = set()
+            for job in jobs:
+                if len(pending) >= workers * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        self.record(future.result())
+                if self.finished():
+                    break
+                pending.add(executor.submit(play_game, *job))
+
+            for future in wait(pending).done:
+                self.record(future.result())
+
+        return self.summary()
+
+    def summary(self) -> dict:
+        return {
+            "first": self.first["name"],
+            "second": self.second["name"],
+            "wins": self.wins,
+            "draws": self.draws,
+            "losses": self.losses,
+            "elo": elo_summary(self.wins, self.draws, self.losses),
+            "sprt": self.sprt_result(),
+            "terminations": self.terminations,
+            "time": time.perf_counter() - self.start_time,
+            "games_per_hour": self.games_per_hour(),
+        }
+
+def print_summary(summary: dict, log=sys.stderr) -> None:
+    elo = summary["elo"]
+    print("-"*16, file=log)
+    print(f"{summary['first']} vs {summary['second']}: +{summary['wins']} ={summary['draws']} -{summary['losses']}, score {elo['score']:.1%} over {elo['games']} games", file=log)
+    print(f"Elo difference: {elo['elo']:+.1f} +/- {elo['error']:.1f}", file=log)
+    if summary["sprt"] is not None:
+        result = summary["sprt"]
+        print(f"SPRT: llr {result['llr']:.2f} ({result['lower']:.2f}, {result['upper']:.2f}) {result['status']}", file=log)
+    print(f"Terminations: {summary['terminations']}", file=log)
+    print(f"Time: {summary['time']:.1f}s, {summary['games_per_hour']:.0f} games/hour", file=log)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog='tournament', description="Play headless games between two bot configurations and write them as pgn")
+    parser.add_argument('--first', default="", help="Settings of the first engine as key=value pairs, depth, movetime and nodes limit the search and the rest are ChessBot options")
+    parser.add_argument('--second', default="", help="Settings of the second engine, in the same form as --first")
+    parser.add_argument('--games', type=int, default=100, help="Number of games, every opening is played with both colours")
+    parser.add_argument('--openings', help="File with one fen or epd opening per line, the games start from the initial position when omitted")
+    parser.add_argument('--workers', type=int, default=1, help="Number of games played at the same time")
+    parser.add_argument('--pgn', help="File the games are appended to as they finish, written to stdout when omitted")
+    parser.add_argument('--sprt', nargs=2, type=float, metavar=("ELO0", "ELO1"), help="Stop once an sprt between these elo differences is decided")
+    parser.add_argument('--max-moves', type=int, default=DEFAULT_RULES["max_moves"], help="Adjudicate a draw after this many moves")
+    parser.add_argument('--resign-score', type=float, default=DEFAULT_RULES["resign_score"], help="Adjudicate a win once both engines agree on a score of at least this many pawns")
+    parser.add_argument('--resign-plies', type=int, default=DEFAULT_RULES["resign_plies"], help="Number of plies in a row the resign score has to hold")
+    parser.add_argument('--draw-score', type=float, default=DEFAULT_RULES["draw_score"], help="Adjudicate a draw once both engines agree on a score within this many pawns")
+    parser.add_argument('--draw-plies', type=int, default=DEFAULT_RULES["draw_plies"], help="Number of plies in a row the draw score has to hold")
+    parser.add_argument('--draw-start', type=int, default=DEFAULT_RULES["draw_start"], help="First move number at which draws are adjudicated")
+    args = parser.parse_args()
+
+    first = parse_engine(args.first, "first")
+    second = parse_engine(args.second, "second")
+    if first["name"] == second["name"]:
+        raise ValueError("Please give the engines different names")
+
+    rules = {rule: getattr(args, rule) for rule in DEFAULT_RULES}
+
+    if args.openings:
+        with open(args.openings) as file:
+            openings = load_openings(file)
+    else:
+        openings = [chess.STARTING_FEN]
+
+    pgn_output = open(args.pgn, "a") if args.pgn else sys.stdout
+    try:
+        tournament = Tournament(first, second, pgn_output, sprt_bounds=tuple(args.sprt) if args.sprt else None)
+        print_summary(tournament.run(schedule(openings, first, second, args.games, rules), args.workers))
+    finally:
+        if pgn_output is not sys.stdout:
+            pgn_output.close()
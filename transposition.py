@@ -0,0 +1,107 @@
+# external imports
+import chess
+
+# bound types stored with every entry
+EXACT = 0
+LOWERBOUND = 1
+UPPERBOUND = 2
+
+def score_bound(score: float, alpha: float, beta: float) -> int:
+    # how a score returned for the window (alpha, beta) relates to the real score
+    if score <= alpha:
+        return UPPERBOUND
+    if score >= beta:
+        return LOWERBOUND
+    return EXACT
+
+# rough memory footprint of one stored entry in bytes (list slot + entry tuple + its contents)
+ENTRY_SIZE = 128
+
+class TranspositionTable:
+    def __init__(self, size_mb: float = 16) -> None:
+        self.resize(size_mb)
+
+    def resize(self, size_mb: float) -> None:
+        # every bucket holds two slots: a depth-preferred slot and an always-replace slot
+        self.size_mb = size_mb
+        self.bucket_count = max(1, int(size_mb * 1024 * 1024 / ENTRY_SIZE) // 2)
+        self.clear()
+
+    def clear(self) -> None:
+        self.entries = [None] * (self.bucket_count * 2)
+        self.filled = 0
+        self.age = 0
+        self.oldest_age = 0
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+        self.stores = 0
+        self.overwrites = 0
+
+    def new_search(self) -> None:
+        # entries from older searches lose their depth priority in the depth-preferred slot
+        self.age += 1
+        self.oldest_age = 0
+
+    def start_over(self) -> None:
+        # the table acts like a cleared one without reallocating it, older entries aren't found and are replaced
+        # like empty slots, until the next search starts
+        self.age += 1
+        self.oldest_age = self.age
+
+    @staticmethod
+    def key(board: chess.Board) -> int:
+        # hash of the bitboards, side to move, castling rights and en passant square
+        return hash(board._transposition_key())
+
+    def probe(self, key: int):
+        index = (key % self.bucket_count) * 2
+        entries = self.entries
+
+        for entry in (entries[index], entries[index + 1]):
+            if entry is not None and entry[0] == key and entry[5] >= self.oldest_age:
+                self.hits += 1
+                return entry
+
+        # the bucket is occupied by other positions
+        if entries[index] is not None or entries[index + 1] is not None:
+            self.collisions += 1
+
+        self.misses += 1
+        return None
+
+    def store(self, key: int, depth: int, score: float, bound: int, move: chess.Move) -> None:
+        index = (key % self.bucket_count) * 2
+        entries = self.entries
+        entry = (key, depth, score, bound, move, self.age)
+        self.stores += 1
+
+        # depth-preferred slot: keep the deepest entry of the current search
+        deep = entries[index]
+        if deep is None or deep[0] == key or depth >= deep[1] or deep[5] != self.age:
+            if deep is None:
+                self.filled += 1
+            elif deep[0] != key:
+                self.overwrites += 1
+
+                # demote the old entry to the always-replace slot instead of losing it
+                if entries[index + 1] is None:
+                    self.filled += 1
+                entries[index + 1] = deep
+
+            entries[index] = entry
+            return
+
+        # always-replace slot
+        if entries[index + 1] is None:
+            self.filled += 1
+        elif entries[index + 1][0] != key:
+            self.overwrites += 1
+        entries[index + 1] = entry
+
+    def hashfull(self) -> int:
+        # permille of slots in use
+        return self.filled * 1000 // len(self.entries)
@@ -0,0 +1,224 @@
+# external imports
+import chess
+import math
+import sys
+import threading
+
+# local imports
+from bot import ChessBot
+
+ENGINE_NAME = "Python Chess Bot"
+ENGINE_AUTHOR = "RealPhonki"
+
+class UciEngine:
+    def __init__(self, output=sys.stdout) -> None:
+        self.output = output
+        self.output_lock = threading.Lock()
+
+        self.bot = ChessBot(chess.BLACK, progress_callback=self.report)
+        self.board = chess.Board()
+
+        # the search runs on its own thread so stop, isready and ponderhit are handled while it thinks
+        self.search_thread = None
+        self.root_turn = chess.WHITE
+
+        # infinite and ponder searches hold back their best move until stop or ponderhit
+        self.release = threading.Event()
+        self.ponder_budget = None
+        self.ponder_timer = None
+
+    def send(self, line: str) -> None:
+        with self.output_lock:
+            self.output.write(line + "\n")
+            self.output.flush()
+
+    def run(self, stream=sys.stdin) -> None:
+        for line in stream:
+            if not self.handle(line.strip()):
+                break
+        self.stop()
+        self.bot.close()
+
+    def handle(self, line: str) -> bool:
+        tokens = line.split()
+        if not tokens:
+            return True
+        command, arguments = tokens[0], tokens[1:]
+
+        if command == "uci":
+            self.send(f"id name {ENGINE_NAME}")
+            self.send(f"id author {ENGINE_AUTHOR}")
+            self.send(f"option name Hash type spin default {self.bot.hash_size_mb:g} min 1 max 4096")
+            self.send(f"option name Threads type spin default {self.bot.workers} min 1 max 256")
+            self.send("option name Ponder type check default false")
+            self.send("uciok")
+        elif command == "isready":
+            self.send("readyok")
+        elif command == "setoption":
+            self.set_option(arguments)
+        elif command == "ucinewgame":
+            self.stop()
+            self.bot.new_game()
+        elif command == "position":
+            self.stop()
+            self.set_position(arguments)
+        elif command == "go":
+            self.stop()
+            self.go(arguments)
+        elif command == "stop":
+            self.stop()
+        elif command == "ponderhit":
+            self.ponderhit()
+        elif command == "quit":
+            return False
+
+        return True
+
+    def set_option(self, arguments: list) -> None:
+        # setoption name <name with spaces> value <value>
+        if "name" not in arguments:
+            return
+        value_index = arguments.index("value") if "value" in arguments else len(arguments)
+        name = " ".join(arguments[arguments.index("name") + 1:value_index]).lower()
+        value = " ".join(arguments[value_index + 1:])
+
+        self.stop()
+        if name == "hash":
+            self.bot.set_hash_size(float(value))
+        elif name == "threads":
+            self.bot.set_workers(max(1, int(value)))
+
+    def set_position(self, arguments: list) -> None:
+        moves_index = arguments.index("moves") if "moves" in arguments else len(arguments)
+
+        if arguments and arguments[0] == "startpos":
+            self.board = chess.Board()
+        elif arguments and arguments[0] == "fen":
+            self.board = chess.Board(" ".join(arguments[1:moves_index]))
+        else:
+            return
+
+        for move in arguments[moves_index + 1:]:
+            self.board.push_uci(move)
+
+    def go(self, arguments: list) -> None:
+        options = {}
+        flags = set()
+        for index, token in enumerate(arguments):
+            if token in ("infinite", "ponder"):
+                flags.add(token)
+            elif index + 1 < len(arguments) and token in ("depth", "movetime", "wtime", "btime", "winc", "binc", "nodes", "movestogo"):
+                options[token] = int(arguments[index + 1])
+
+        # uci times are in milliseconds, the bot works in seconds
+        white = self.board.turn == chess.WHITE
+        clock = options.get("wtime" if white else "btime")
+        limits = {
+            "depth": options.get("depth"),
+            "time_limit": options["movetime"] / 1000 if "movetime" in options else None,
+            "clock": clock / 1000 if clock is not None else None,
+            "increment": options.get("winc" if white else "binc", 0) / 1000,
+            "max_nodes": options.get("nodes"),
+        }
+        if "movestogo" in options and clock is not None:
+            limits["time_limit"] = min(limits["time_limit"] or math.inf, clock / 1000 / max(options["movestogo"], 1))
+
+        # pondering and infinite searches run until they are stopped, a ponderhit starts the move's own clock
+        self.release.clear()
+        self.ponder_budget = None
+        if flags:
+            if "ponder" in flags:
+                self.ponder_budget = self.bot.allocate_time(limits["time_limit"], limits["clock"], limits["increment"])
+            limits = {"depth": limits["depth"] or self.bot.MAX_DEPTH, "time_limit": math.inf, "clock": None, "increment": 0, "max_nodes": limits["max_nodes"]}
+        else:
+            self.release.set()
+
+        self.root_turn = self.board.turn
+        self.bot.clear_stop()
+        self.search_thread = threading.Thread(target=self.search, args=(self.board.copy(), limits), daemon=True)
+        self.search_thread.start()
+
+    def search(self, board: chess.Board, limits: dict) -> None:
+        move = self.bot.get_best_move(board, clear_stop=False, **limits)
+
+        # uci doesn't allow a best move before stop or ponderhit in infinite and ponder mode
+        self.release.wait()
+
+        if move is None:
+            self.send("bestmove 0000")
+        elif len(self.bot.pv_moves) > 1:
+            self.send(f"bestmove {move.uci()} ponder {self.bot.pv_moves[1].uci()}")
+        else:
+            self.send(f"bestmove {move.uci()}")
+
+    def stop(self) -> None:
+        if self.ponder_timer is not None:
+            self.ponder_timer.cancel()
+            self.ponder_timer = None
+
+        if self.search_thread is not None:
+            self.bot.stop()
+            self.release.set()
+            self.search_thread.join()
+            self.search_thread = None
+
+    def ponderhit(self) -> None:
+        # the opponent played the expected move, the search continues on the normal time budget
+        if self.ponder_budget is not None and self.ponder_budget != math.inf and self.search_thread is not None:
+            self.ponder_timer = threading.Timer(self.ponder_budget, self.bot.stop)
+            self.ponder_timer.start()
+        self.ponder_budget = None
+        self.release.set()
+
+    def report(self, info: dict) -> None:
+        if info["type"] != "iteration":
+            return
+
+        # uci scores are in centipawns from the point of view of the side to move
+        score = info["score"] if self.root_turn == chess.WHITE else -info["score"]
+        if math.isinf(score):
+            moves_to_mate = (len(info["pv"]) + 1) // 2
+            score_text = f"mate {moves_to_mate if score > 0 else -moves_to_mate}"
+        else:
+            score_text = f"cp {round(score * 100)}"
+
+        nodes = info["nodes"] + self.bot.quiescence_nodes
+        elapsed = max(info["time"], 1e-6)
+        self.send(f"info depth {info['depth']} score {score_text} nodes {nodes} nps {int(nodes / elapsed)} time {int(info['time'] * 1000)} pv {' '.join(move.uci() for move in info['pv'])}")
+
+if __name__ == '__main__':
+    import os
+    import signal
+    import subprocess
+
+    # smoke check of the engine the way a gui runs it, with commands on a piped stdin, for the serial and the parallel search
+    failures = 0
+    for threads in (1, 2):
+        commands = f"uci\nsetoption name Threads value {threads}\nisready\nposition startpos moves e2e4\ngo nodes 3000\n"
+        engine = subprocess.Popen([sys.executable, "-m", "bot", "--uci"], stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, start_new_session=True)
+        engine.stdin.write(commands)
+        engine.stdin.flush()
+
+        # quit only follows the best move like it would from a gui, a hung engine is killed with its worker processes
+        answer = None
+        timer = threading.Timer(60, os.killpg, (engine.pid, signal.SIGKILL))
+        timer.start()
+        for line in engine.stdout:
+            if line.startswith("bestmove"):
+                answer = line.strip()
+                break
+        timer.cancel()
+
+        if answer is not None:
+            engine.stdin.write("quit\n")
+            engine.stdin.flush()
+        engine.wait()
+
+        board = chess.Board()
+        board.push_uci("e2e4")
+        passed = answer is not None and chess.Move.from_uci(answer.split()[1]) in board.legal_moves
+        print(f"threads {threads}: {answer or 'no best move within 60 seconds'}{'' if passed else ', failed'}")
+        failures += not passed
+
+    if failures:
+        exit(1)